@@ -0,0 +1,169 @@
+# app/core/astro_pool.py
+"""
+Process pool for CPU-heavy ephemeris work.
+
+Skyfield and numpy hold the GIL for most of a sky computation, so on the
+shared threadpool a burst of sky requests slows every other endpoint in the
+worker. Here they run in separate processes instead. Each child loads the
+timescale and ephemeris once, in its initializer, so jobs never pay for
+kernel I/O. Jobs must be module-level functions with picklable arguments
+(plain lat/lon/dates, not ORM objects).
+
+Admission is bounded: past ASTRO_QUEUE_LIMIT queued/running jobs, or past a
+job's deadline, callers get a 503 with Retry-After instead of piling up.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, TypeVar
+
+from fastapi import HTTPException
+
+from app.core.config import (
+    ASTRO_POOL_START_METHOD,
+    ASTRO_POOL_WORKERS,
+    ASTRO_QUEUE_LIMIT,
+    ASTRO_TIMEOUT_SECONDS,
+)
+from app.core.ephemeris import warm_up
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_pool: Optional[Executor] = None
+
+# admission bookkeeping; only touched from the event loop
+_pending = 0
+_avg_job_seconds = 0.5  # running average of job run time, for Retry-After
+
+
+class _JobHTTPError(Exception):
+    # HTTPException doesn't survive pickling; its status/detail are carried back as plain args
+    pass
+
+
+def _run_job(fn: Callable[..., T], args: tuple) -> tuple[T, float]:
+    # (result, seconds of actual work), for the Retry-After estimate
+    started = time.perf_counter()
+    try:
+        return fn(*args), time.perf_counter() - started
+    except HTTPException as exc:
+        raise _JobHTTPError(exc.status_code, exc.detail)
+
+
+def _init_child() -> None:
+    warm_up()
+
+
+def _noop() -> None:
+    pass
+
+
+def get_pool() -> Executor:
+    """The shared pool, started on first use. Threads when ASTRO_POOL_WORKERS=0 (dev)."""
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                if ASTRO_POOL_WORKERS <= 0:
+                    _pool = ThreadPoolExecutor(thread_name_prefix="astro")
+                else:
+                    _pool = ProcessPoolExecutor(
+                        max_workers=ASTRO_POOL_WORKERS,
+                        mp_context=multiprocessing.get_context(ASTRO_POOL_START_METHOD),
+                        initializer=_init_child,
+                    )
+    return _pool
+
+
+def start_pool() -> None:
+    """Spawn the children now (they load the ephemeris) instead of on the first sky request."""
+    pool = get_pool()
+    if ASTRO_POOL_WORKERS <= 0:
+        pool.submit(warm_up)  # threads share this process's ephemeris
+        return
+    for _ in range(ASTRO_POOL_WORKERS):
+        pool.submit(_noop)
+
+
+def _discard(pool: Executor) -> None:
+    # a child died (OOM kill, segfault): the executor is unusable, start over
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _retry_after() -> str:
+    workers = max(ASTRO_POOL_WORKERS, 1)
+    return str(max(1, math.ceil(_pending * _avg_job_seconds / workers)))
+
+
+def _unavailable(detail: str) -> HTTPException:
+    return HTTPException(status_code=503, detail=detail, headers={"Retry-After": _retry_after()})
+
+
+def pending_jobs() -> int:
+    return _pending
+
+
+async def run_astro(fn: Callable[..., T], *args: Any, timeout: Optional[float] = None) -> T:
+    """
+    fn(*args) on the pool. 503 when the queue is full or the result isn't
+    ready within `timeout` (default ASTRO_TIMEOUT_SECONDS); HTTPExceptions
+    raised by the job come back as themselves.
+    """
+    global _pending
+    if _pending >= ASTRO_QUEUE_LIMIT:
+        logger.warning("Astronomy pool full, rejecting job", extra={"pending": _pending})
+        raise _unavailable("Server busy, try again shortly")
+
+    pool = get_pool()
+    try:
+        future = pool.submit(_run_job, fn, args)
+    except BrokenProcessPool:
+        _discard(pool)
+        future = get_pool().submit(_run_job, fn, args)
+
+    _pending += 1
+
+    def _done(f: asyncio.Future) -> None:
+        # the job may still run after its caller gave up; it counts until it's finished
+        global _pending, _avg_job_seconds
+        _pending -= 1
+        if not f.cancelled() and f.exception() is None:
+            _avg_job_seconds = 0.9 * _avg_job_seconds + 0.1 * f.result()[1]
+
+    wrapped = asyncio.wrap_future(future)
+    wrapped.add_done_callback(_done)
+    try:
+        result, _ = await asyncio.wait_for(asyncio.shield(wrapped), timeout or ASTRO_TIMEOUT_SECONDS)
+        return result
+    except asyncio.TimeoutError:
+        future.cancel()  # only helps if it hasn't started
+        logger.warning("Astronomy job timed out", extra={"job": getattr(fn, "__name__", str(fn))})
+        raise _unavailable("Sky computation timed out, try again shortly")
+    except _JobHTTPError as exc:
+        raise HTTPException(status_code=exc.args[0], detail=exc.args[1])
+    except BrokenProcessPool:
+        logger.error("Astronomy worker died, restarting the pool")
+        _discard(pool)
+        raise _unavailable("Sky computation failed, try again shortly")
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
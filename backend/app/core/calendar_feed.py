@@ -0,0 +1,171 @@
+# app/core/calendar_feed.py
+"""
+Rendered per-user calendar feeds for subscription URLs.
+
+Each user's feed keeps one rendered VEVENT per session. Session writes mark
+just that event dirty (or drop it), so the next poll re-renders only what
+changed. Writes handled by other workers can't mark anything here, so at
+most every CALENDAR_FEED_SYNC_SECONDS a poll compares the user's
+(count, max id, max updated_at) in the DB with what the feed holds and
+rebuilds it on a mismatch; polls in between don't touch the DB.
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+
+from app.core.cache import TTLCache
+from app.core.config import (
+    CALENDAR_FEED_CACHE_SIZE,
+    CALENDAR_FEED_SYNC_SECONDS,
+    CALENDAR_FEED_TTL_SECONDS,
+)
+from app.core.ics import ICS_FOOTER, ICS_HEADER, render_vevent
+from app.core.singleflight import SingleFlight
+from app.db.database import AsyncReadSessionLocal
+from app.models.location import Location
+from app.models.observation_session import ObservationSession
+
+FEED_EVENT_DURATION = timedelta(minutes=90)
+
+
+@dataclass
+class RenderedFeed:
+    # session id -> (sort key, rendered VEVENT, session updated_at, location updated_at)
+    events: Dict[int, Tuple[Tuple[datetime, int], str, Optional[datetime], Optional[datetime]]] = field(
+        default_factory=dict
+    )
+    dirty: Set[int] = field(default_factory=set)
+    body: Optional[str] = None
+    etag: str = ""
+    last_modified: Optional[datetime] = None
+    checked_at: float = 0.0  # monotonic time of the last check against the DB
+
+    def version(self) -> tuple:
+        # what _version_stmt() returns for exactly these rows
+        return (
+            len(self.events),
+            max(self.events, default=None),
+            max((e[2] for e in self.events.values() if e[2] is not None), default=None),
+            max((e[3] for e in self.events.values() if e[3] is not None), default=None),
+        )
+
+
+def _feed_stmt(user_id: int):
+    return (
+        select(ObservationSession, Location)
+        .join(Location, Location.id == ObservationSession.location_id)
+        .where(ObservationSession.owner_id == user_id)
+    )
+
+
+def _version_stmt(user_id: int):
+    return (
+        select(
+            func.count(ObservationSession.id),
+            func.max(ObservationSession.id),
+            func.max(ObservationSession.updated_at),
+            func.max(Location.updated_at),
+        )
+        .join(Location, Location.id == ObservationSession.location_id)
+        .where(ObservationSession.owner_id == user_id)
+    )
+
+
+class CalendarFeedCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self._feeds = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._flight = SingleFlight()
+
+    # --- invalidation (called after the write is committed) ---
+
+    def session_changed(self, user_id: int, session_id: int) -> None:
+        feed = self._feeds.get(user_id)
+        if feed is not None:
+            feed.dirty.add(session_id)
+
+    def session_deleted(self, user_id: int, session_id: int) -> None:
+        feed = self._feeds.get(user_id)
+        if feed is not None:
+            feed.dirty.discard(session_id)
+            if feed.events.pop(session_id, None) is not None:
+                feed.body = None
+
+    def invalidate_user(self, user_id: int) -> None:
+        # location edits touch every event at that location
+        self._feeds.pop(user_id)
+
+    def clear(self) -> None:
+        self._feeds.clear()
+
+    # --- rendering ---
+
+    async def get(self, user_id: int) -> RenderedFeed:
+        feed = self._feeds.get(user_id)
+        if (
+            feed is not None
+            and feed.body is not None
+            and not feed.dirty
+            and time.monotonic() - feed.checked_at < CALENDAR_FEED_SYNC_SECONDS
+        ):
+            return feed
+        return await self._flight.do(user_id, lambda: self._refresh(user_id))
+
+    async def _refresh(self, user_id: int) -> RenderedFeed:
+        feed = self._feeds.get(user_id)
+        try:
+            async with AsyncReadSessionLocal() as db:
+                current = tuple((await db.execute(_version_stmt(user_id))).one())
+                if feed is not None:
+                    ids = set(feed.dirty)
+                    feed.dirty -= ids  # anything marked from here on waits for the next refresh
+                    for sid in ids:
+                        feed.events.pop(sid, None)
+                    if ids:
+                        stmt = _feed_stmt(user_id).where(ObservationSession.id.in_(ids))
+                        self._load(feed, (await db.execute(stmt)).all())
+                    if feed.version() != current:
+                        # changed on another worker: start over, keeping the
+                        # validators in case the content turns out the same
+                        feed = RenderedFeed(etag=feed.etag, last_modified=feed.last_modified)
+                        self._feeds.set(user_id, feed)
+                        self._load(feed, (await db.execute(_feed_stmt(user_id))).all())
+                else:
+                    feed = RenderedFeed()
+                    # cache it before querying so writes landing mid-load get marked dirty
+                    self._feeds.set(user_id, feed)
+                    self._load(feed, (await db.execute(_feed_stmt(user_id))).all())
+        except Exception:
+            self._feeds.pop(user_id)  # half-updated; rebuild from scratch next time
+            raise
+        feed.checked_at = time.monotonic()
+
+        ordered = sorted(feed.events.values(), key=lambda e: e[0])
+        body = ICS_HEADER + "".join(e[1] for e in ordered) + ICS_FOOTER
+        etag = '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+        if etag != feed.etag:
+            # deletions leave no timestamp behind, so max(updated_at) could
+            # date a fresh build before a copy a client got elsewhere (another
+            # worker, before a restart): use the time we built or noticed it
+            feed.last_modified = datetime.now(timezone.utc)
+        feed.body, feed.etag = body, etag
+        self._feeds.set(user_id, feed)
+        return feed
+
+    @staticmethod
+    def _load(feed: RenderedFeed, rows) -> None:
+        for s, loc in rows:
+            feed.events[s.id] = (
+                (s.scheduled_start, s.id),
+                render_vevent(s, loc, FEED_EVENT_DURATION),
+                s.updated_at,
+                loc.updated_at,
+            )
+
+
+calendar_feeds = CalendarFeedCache(CALENDAR_FEED_CACHE_SIZE, CALENDAR_FEED_TTL_SECONDS)
@@ -0,0 +1,186 @@
+# app/core/catalog.py
+"""
+Deep-sky catalog loaded from a compact .npy file, with a coarse RA/Dec grid
+index so requests can drop everything below the horizon limit before any
+apparent-position math.
+
+Build the file with:
+    python -m app.core.catalog objects.csv dso_catalog.npy
+where the CSV has the columns name,ra_hours,dec_deg,mag,type.
+"""
+from __future__ import annotations
+
+import csv
+import hashlib
+import logging
+import os
+import sys
+from typing import Optional
+
+import numpy as np
+from skyfield.api import Star
+
+from app.core.config import CATALOG_PATH
+
+logger = logging.getLogger(__name__)
+
+# fixed-width fields only, so np.load(..., mmap_mode="r") works
+CATALOG_DTYPE = np.dtype(
+    [
+        ("name", "U40"),
+        ("ra_hours", "f8"),
+        ("dec_deg", "f8"),
+        ("mag", "f4"),  # NaN when unknown
+        ("type", "U8"),  # OpenNGC-style codes: G, OCl, GCl, PN, Neb, ...
+    ]
+)
+
+# used when no catalog file is present
+BUILTIN_TARGETS = [
+    # name, ra_hours, dec_degrees, mag, type
+    ("Orion Nebula (M42)", 5 + 35/60, -(5 + 23/60), 4.0, "Neb"),
+    ("Andromeda Galaxy (M31)", 0 + 42/60, 41 + 16/60, 3.4, "G"),
+    ("Pleiades (M45)", 3 + 47/60, 24 + 7/60, 1.6, "OCl"),
+]
+
+# J2000 catalog vs apparent place of date (precession since 2000, nutation,
+# aberration) stays well under this, so culling never drops a visible object
+CULL_MARGIN_DEG = 1.0
+
+
+class Catalog:
+    """
+    Objects are sorted by grid cell (dec band x RA bin) once at load time.
+    Per request we compute the highest altitude any point of each cell can
+    reach (a few hundred cells), then keep only objects in cells that can
+    clear the horizon limit.
+    """
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        band_deg: float = 5.0,
+        ra_bin_hours: float = 1.0,
+        version: Optional[str] = None,
+    ):
+        # identifies the contents for result caches; hashing a mmapped file
+        # would read all of it, so load_catalog() passes size + mtime instead
+        self.version = version or hashlib.sha1(np.ascontiguousarray(data).tobytes()).hexdigest()[:12]
+        self.band_deg = band_deg
+        self.ra_bin_hours = ra_bin_hours
+        self.n_bands = int(np.ceil(180.0 / band_deg))
+        self.n_ra_bins = int(np.ceil(24.0 / ra_bin_hours))
+
+        band = np.clip(((data["dec_deg"] + 90.0) // band_deg).astype(int), 0, self.n_bands - 1)
+        ra_bin = (np.mod(data["ra_hours"], 24.0) // ra_bin_hours).astype(int) % self.n_ra_bins
+        cell = band * self.n_ra_bins + ra_bin
+
+        if np.all(cell[:-1] <= cell[1:]):
+            # build_catalog() writes files pre-sorted, keep the memory map as-is
+            self.data = data
+            self.cell = cell
+        else:
+            order = np.argsort(cell, kind="stable")
+            self.data = data[order]
+            self.cell = cell[order]
+
+        # plain float arrays for the hot path (structured field access is slower)
+        self.names = self.data["name"]
+        self.ra_hours = np.ascontiguousarray(self.data["ra_hours"], dtype=float)
+        self.dec_deg = np.ascontiguousarray(self.data["dec_deg"], dtype=float)
+        self.mag = np.asarray(self.data["mag"], dtype=float)
+        self.types = self.data["type"]
+
+        # cell bounds, flattened in cell-id order
+        bands = np.arange(self.n_bands)
+        ra_bins = np.arange(self.n_ra_bins)
+        self._dec_lo = np.repeat(-90.0 + bands * band_deg, self.n_ra_bins)
+        self._dec_hi = np.minimum(self._dec_lo + band_deg, 90.0)
+        self._ra_lo = np.tile(ra_bins * ra_bin_hours, self.n_bands)
+        self._ra_hi = np.minimum(self._ra_lo + ra_bin_hours, 24.0)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def _cell_max_alt(self, lat_deg: float, lst_hours: float) -> np.ndarray:
+        # hour-angle distance from the meridian to the nearest edge of each cell
+        ha_lo = np.mod(lst_hours - self._ra_hi, 24.0)
+        ha_hi = np.mod(lst_hours - self._ra_lo, 24.0)
+        inside = (ha_lo > ha_hi) | (ha_lo == 0.0)  # meridian crosses the RA range
+        edge = np.minimum(np.minimum(ha_lo, 24.0 - ha_lo), np.minimum(ha_hi, 24.0 - ha_hi))
+        ha = np.radians(np.where(inside, 0.0, edge) * 15.0)
+
+        # sin(alt) = sin(lat) sin(dec) + cos(lat) cos(ha) cos(dec) = R cos(dec - dec0):
+        # over [dec_lo, dec_hi] the max is at dec0 (if inside) or at an end
+        lat = np.radians(lat_deg)
+        a = np.sin(lat)
+        b = np.cos(lat) * np.cos(ha)
+        lo = np.radians(self._dec_lo)
+        hi = np.radians(self._dec_hi)
+        peak = np.clip(np.arctan2(a, b), lo, hi)
+        sin_alt = np.maximum.reduce(
+            [a * np.sin(d) + b * np.cos(d) for d in (peak, lo, hi)]
+        )
+        return np.degrees(np.arcsin(np.clip(sin_alt, -1.0, 1.0)))
+
+    def above(self, lat_deg: float, lst_hours: float, min_alt_deg: float) -> np.ndarray:
+        """Indices of objects in cells that can be above min_alt_deg right now."""
+        cell_ok = self._cell_max_alt(lat_deg, lst_hours) >= min_alt_deg - CULL_MARGIN_DEG
+        return np.flatnonzero(cell_ok[self.cell])
+
+    def ever_above(self, lat_deg: float, min_alt_deg: float) -> np.ndarray:
+        """Indices of objects whose culmination clears min_alt_deg at this latitude."""
+        culmination = 90.0 - np.abs(lat_deg - self.dec_deg)
+        return np.flatnonzero(culmination >= min_alt_deg - CULL_MARGIN_DEG)
+
+    def star(self, idx: Optional[np.ndarray] = None) -> Star:
+        """One array-valued Star for the selected objects (all if idx is None)."""
+        if idx is None:
+            return Star(ra_hours=self.ra_hours, dec_degrees=self.dec_deg)
+        return Star(ra_hours=self.ra_hours[idx], dec_degrees=self.dec_deg[idx])
+
+
+def builtin_catalog() -> Catalog:
+    return Catalog(np.array(BUILTIN_TARGETS, dtype=CATALOG_DTYPE))
+
+
+def load_catalog(path: Optional[str] = None) -> Catalog:
+    path = path or CATALOG_PATH
+    if not os.path.exists(path):
+        logger.info("No catalog at %s, using %d built-in targets", path, len(BUILTIN_TARGETS))
+        return builtin_catalog()
+
+    data = np.load(path, mmap_mode="r")
+    if data.dtype != CATALOG_DTYPE:
+        raise ValueError(f"{path}: expected dtype {CATALOG_DTYPE}, got {data.dtype}")
+    logger.info("Loaded %d catalog objects from %s", len(data), path)
+    st = os.stat(path)
+    version = hashlib.sha1(f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:12]
+    return Catalog(data, version=version)
+
+
+def build_catalog(csv_path: str, out_path: str) -> int:
+    """Convert a name,ra_hours,dec_deg,mag,type CSV into the .npy format."""
+    rows = []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            mag = (r.get("mag") or "").strip()
+            rows.append(
+                (
+                    r["name"].strip(),
+                    float(r["ra_hours"]),
+                    float(r["dec_deg"]),
+                    float(mag) if mag else np.nan,
+                    (r.get("type") or "").strip(),
+                )
+            )
+    # save in index order so load_catalog() can use the memory map directly
+    np.save(out_path, Catalog(np.array(rows, dtype=CATALOG_DTYPE)).data)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m app.core.catalog objects.csv dso_catalog.npy")
+    n = build_catalog(sys.argv[1], sys.argv[2])
+    print(f"wrote {n} objects to {sys.argv[2]}")
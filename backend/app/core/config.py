@@ -4,6 +4,80 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+# apply pending schema migrations at startup (app/db/migrations.py)
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "1") == "1"
+
 SECRET_KEY = os.getenv("SECRET_KEY", "change_me_in_prod")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+# refresh tokens rotate on every use; a login stays alive this long without the password
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# how often each worker pulls new access-token revocations (logout on another worker)
+TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", "5"))
+# password KDF: pbkdf2_sha256 rounds (stored hashes with other rounds are upgraded
+# on the next login) and the size of the dedicated hashing pool
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "29000"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# get_current_user trusts a verified token for a user id it has seen recently;
+# how long a deleted/disabled account can keep using an unexpired token
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+
+# compact deep-sky catalog (see app/core/catalog.py); built-in list if missing
+CATALOG_PATH = os.getenv("CATALOG_PATH", "./dso_catalog.npy")
+
+# Skyfield ephemeris: any JPL kernel with Sun/Moon/planets (de421.bsp, de440s.bsp, ...).
+# Loaded lazily on first use; relative paths resolve against SKYFIELD_DATA_DIR.
+EPHEMERIS_PATH = os.getenv("EPHEMERIS_PATH", "de421.bsp")
+SKYFIELD_DATA_DIR = os.getenv("SKYFIELD_DATA_DIR", ".")
+# start the astronomy pool (its children load the ephemeris) at startup instead of on the first sky request
+EPHEMERIS_WARMUP = os.getenv("EPHEMERIS_WARMUP", "1") == "1"
+# worker processes for CPU-heavy sky math (app/core/astro_pool.py); 0 runs it
+# on the threadpool instead. "spawn" children don't inherit the server's threads.
+ASTRO_POOL_WORKERS = int(os.getenv("ASTRO_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+ASTRO_POOL_START_METHOD = os.getenv("ASTRO_POOL_START_METHOD", "spawn")
+# jobs queued or running before new ones get a 503, and how long one request
+# waits for its result (also 503; the client should retry later)
+ASTRO_QUEUE_LIMIT = int(os.getenv("ASTRO_QUEUE_LIMIT", str(8 * max(ASTRO_POOL_WORKERS, 1))))
+ASTRO_TIMEOUT_SECONDS = float(os.getenv("ASTRO_TIMEOUT_SECONDS", "15"))
+
+# /targets/visible result cache (app/core/result_cache.py): requests for nearby
+# sites (VISIBLE_CACHE_GRID_DEG) in the same VISIBLE_CACHE_STEP_SECONDS share one
+# answer, computed at the snapped place and time; exact=true skips it.
+# VISIBLE_CACHE_DB: optional SQLite file so all workers on the box share entries
+VISIBLE_CACHE_STEP_SECONDS = int(os.getenv("VISIBLE_CACHE_STEP_SECONDS", "60"))
+VISIBLE_CACHE_GRID_DEG = float(os.getenv("VISIBLE_CACHE_GRID_DEG", "0.01"))
+VISIBLE_CACHE_SIZE = int(os.getenv("VISIBLE_CACHE_SIZE", "4096"))
+VISIBLE_CACHE_TTL_SECONDS = float(os.getenv("VISIBLE_CACHE_TTL_SECONDS", "900"))
+VISIBLE_CACHE_DB = os.getenv("VISIBLE_CACHE_DB", "")
+
+# shared outbound HTTP client (Open-Meteo weather + geocoding)
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF_SECONDS = float(os.getenv("HTTP_BACKOFF_SECONDS", "0.25"))
+
+# forecast cache (app/core/weather_client.py)
+WEATHER_GRID_DEG = float(os.getenv("WEATHER_GRID_DEG", "0.05"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "2048"))
+# how often new model runs land upstream; cache entries expire at the next one
+WEATHER_MODEL_UPDATE_HOURS = int(os.getenv("WEATHER_MODEL_UPDATE_HOURS", "3"))
+# optional SQLite file so the cache survives restarts / is shared by workers
+WEATHER_CACHE_DB = os.getenv("WEATHER_CACHE_DB", "")
+# max upstream requests in flight for one batch weather call
+WEATHER_BATCH_CONCURRENCY = int(os.getenv("WEATHER_BATCH_CONCURRENCY", "4"))
+
+# local geocoding store (app/core/geocoding_store.py)
+GEOCODE_DB = os.getenv("GEOCODE_DB", "./geocode.db")
+
+# rendered per-user calendar feeds (app/core/calendar_feed.py). Writes on this
+# worker update its copy right away; writes on other workers are picked up by a
+# cheap per-user DB check at most every CALENDAR_FEED_SYNC_SECONDS
+CALENDAR_FEED_CACHE_SIZE = int(os.getenv("CALENDAR_FEED_CACHE_SIZE", "1024"))
+CALENDAR_FEED_TTL_SECONDS = float(os.getenv("CALENDAR_FEED_TTL_SECONDS", "600"))
+CALENDAR_FEED_SYNC_SECONDS = float(os.getenv("CALENDAR_FEED_SYNC_SECONDS", "5"))
+
+# POST /sessions/bulk: most rows one request may create (one transaction)
+SESSION_IMPORT_MAX_ROWS = int(os.getenv("SESSION_IMPORT_MAX_ROWS", "5000"))
@@ -1,29 +1,69 @@
+import logging
+from dataclasses import dataclass
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.config import SECRET_KEY, ALGORITHM
-from app.core.security import verify_password
-from app.db.database import get_db
+from app.core.cache import TTLCache
+from app.core.config import (
+    ALGORITHM,
+    AUTH_USER_CACHE_SIZE,
+    AUTH_USER_CACHE_TTL_SECONDS,
+    SECRET_KEY,
+)
+from app.core.security import verify_and_update_async
+from app.core.tokens import revoked_tokens
+from app.db.database import AsyncReadSessionLocal, get_async_read_db
 from app.models.user import User
 
+logger = logging.getLogger(__name__)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+# same, but a missing header is None instead of a 401 (logout)
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        return None
-    if not verify_password(password, user.hashed_password):
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller, built from token claims. Load the User row only if you need more."""
+    id: int
+
+
+# user id -> account still exists; keeps the DB out of the per-request path
+_active_users = TTLCache(maxsize=AUTH_USER_CACHE_SIZE, ttl=AUTH_USER_CACHE_TTL_SECONDS)
+
+
+def forget_user(user_id: int) -> None:
+    """Drop a user from the auth cache (account deleted/disabled)."""
+    _active_users.pop(user_id)
+
+
+async def _user_is_active(user_id: int) -> bool:
+    active = _active_users.get(user_id)
+    if active is None:
+        async with AsyncReadSessionLocal() as db:
+            active = await db.scalar(select(User.id).where(User.id == user_id)) is not None
+        _active_users.set(user_id, active)
+    return active
+
+
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await db.scalar(select(User).where(User.email == email))
+    ok, new_hash = await verify_and_update_async(password, user.hashed_password if user else None)
+    if not ok:
         return None
+    if new_hash is not None:
+        # hashed with old KDF settings; upgrade while we have the plaintext
+        user.hashed_password = new_hash
+        await db.commit()
+        logger.info("Rehashed password", extra={"user_id": user.id})
     return user
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -32,23 +72,39 @@ def get_current_user(
 
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        subject = payload.get("sub")
-        if subject is None:
-            raise credentials_exception
+    except JWTError as e:
+        logger.debug("Rejected token", extra={"reason": str(e)})
+        raise credentials_exception
 
-        try:
-            user_id = int(subject)
-        except (TypeError, ValueError):
-            raise credentials_exception
+    try:
+        user_id = int(payload.get("sub"))
+    except (TypeError, ValueError):
+        logger.debug("Rejected token", extra={"reason": "bad subject"})
+        raise credentials_exception
 
-    except JWTError as e:
-        print(f"DEBUG - JWT Error: {e}")
+    # logged out / refresh token reused: the token or its whole login family
+    if await revoked_tokens.is_revoked(payload.get("jti"), payload.get("fam")):
+        logger.info("Revoked token", extra={"user_id": user_id})
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        print(f"DEBUG - User {user_id} not found in database")
+    if not await _user_is_active(user_id):
+        logger.info("Token for unknown user", extra={"user_id": user_id})
         raise credentials_exception
 
-    print(f"DEBUG - Successfully authenticated user: {user.email}")
+    return Principal(id=user_id)
+
+
+async def get_current_user_record(
+    principal: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db),
+) -> User:
+    """Full User row, for the few endpoints that need more than the id."""
+    user = await db.get(User, principal.id)
+    if user is None:
+        forget_user(principal.id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
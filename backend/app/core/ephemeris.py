@@ -0,0 +1,95 @@
+# app/core/ephemeris.py
+"""
+Lazy, process-wide Skyfield ephemeris.
+
+Nothing is read at import time, so importing the routers (and starting a
+worker) no longer waits on kernel I/O. The kernel is opened by jplephem,
+which memory-maps the segments it reads: workers on one box share those
+pages through the OS page cache instead of each holding a private copy, and
+a server that forks after calling get_ephemeris() (e.g. gunicorn --preload)
+shares the mapping itself.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from skyfield.api import Loader
+
+from app.core.config import EPHEMERIS_PATH, SKYFIELD_DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_loader = Loader(SKYFIELD_DATA_DIR, verbose=False)
+_timescale = None
+_ephemeris: Optional["Ephemeris"] = None
+
+
+@dataclass(frozen=True)
+class Ephemeris:
+    kernel: object  # skyfield SpiceKernel
+    earth: object
+    sun: object
+    moon: object
+    planets: Dict[str, object]
+
+
+def _body(kernel, *names):
+    # DE440s and friends ship some planets only as barycenters
+    for name in names:
+        try:
+            return kernel[name]
+        except KeyError:
+            continue
+    raise KeyError(f"{names[0]} not in ephemeris {EPHEMERIS_PATH}")
+
+
+def _load() -> Ephemeris:
+    kernel = _loader(EPHEMERIS_PATH)
+    logger.info("Loaded ephemeris %s", EPHEMERIS_PATH)
+    return Ephemeris(
+        kernel=kernel,
+        earth=kernel["earth"],
+        sun=kernel["sun"],
+        moon=kernel["moon"],
+        planets={
+            "Mercury": _body(kernel, "mercury", "mercury barycenter"),
+            "Venus": _body(kernel, "venus", "venus barycenter"),
+            "Mars": _body(kernel, "mars", "mars barycenter"),
+            "Jupiter": kernel["jupiter barycenter"],
+            "Saturn": kernel["saturn barycenter"],
+            "Uranus": kernel["uranus barycenter"],
+            "Neptune": kernel["neptune barycenter"],
+        },
+    )
+
+
+def get_timescale():
+    global _timescale
+    if _timescale is None:
+        with _lock:
+            if _timescale is None:
+                _timescale = _loader.timescale()  # builtin leap-second/∆T tables
+    return _timescale
+
+
+def get_ephemeris() -> Ephemeris:
+    global _ephemeris
+    if _ephemeris is None:
+        with _lock:
+            if _ephemeris is None:
+                _ephemeris = _load()
+    return _ephemeris
+
+
+def warm_up() -> None:
+    """Load everything now; the astronomy pool runs this when it starts its workers."""
+    try:
+        get_timescale()
+        get_ephemeris()
+    except Exception:
+        # the first sky request will retry and surface the error
+        logger.exception("Ephemeris warm-up failed")
@@ -1,40 +1,109 @@
 # app/core/geocoding_client.py
+import asyncio
+import logging
+import sqlite3
+
 import httpx
 
+from app.core.geocoding_store import get_geocoding_store, normalize
+from app.core.http_client import http_get
+from app.core.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# upstream results per query; the extras feed the local store for /geocode/suggest
+UPSTREAM_RESULT_COUNT = 10
+
 
 class GeocodingError(Exception):
     pass
 
 
+# identical lookups already in flight share one upstream request
+_geocode_flight = SingleFlight()
+
+
 async def geocode_place(name: str) -> dict:
     """
-    Look up a place name using Open-Meteo's geocoding API.
+    Look up a place name, from the local store when we've seen it before,
+    otherwise with Open-Meteo's geocoding API.
     Returns a small dict with name/lat/lon/country/timezone.
     """
+    # the store is plain sqlite3: keep its calls (and its lock) off the event loop
+    try:
+        place = await asyncio.to_thread(lambda: get_geocoding_store().lookup(name))
+    except sqlite3.Error:
+        logger.exception("Geocoding store lookup failed")
+        place = None
+    if place is not None:
+        return place
+
+    key = normalize(name)
+    return await _geocode_flight.do(key, lambda: _geocode_upstream(name))
+
+
+async def suggest_places(prefix: str, limit: int = 10) -> list:
+    """
+    Typeahead matches from local data; upstream is only asked when the
+    local store is unusable (GeocodingError if that fails too).
+    """
+    try:
+        return await asyncio.to_thread(lambda: get_geocoding_store().suggest(prefix, limit))
+    except sqlite3.Error:
+        logger.exception("Geocoding store suggest failed")
+
+    key = ("suggest", normalize(prefix), limit)
+    results = await _geocode_flight.do(key, lambda: _search_upstream(prefix, limit))
+    return [_as_place(r, prefix) for r in results]
+
+
+def _store_results(name: str, results: list) -> None:
+    store = get_geocoding_store()
+    store.add_places(r for r in results if "id" in r)
+    if "id" in results[0]:
+        store.remember_query(name, results[0]["id"])
+
+
+def _as_place(r: dict, name: str) -> dict:
+    return {
+        "name": r.get("name") or name,
+        "latitude": r["latitude"],
+        "longitude": r["longitude"],
+        "country": r.get("country"),
+        "admin1": r.get("admin1"),
+        "timezone": r.get("timezone"),
+    }
+
+
+async def _search_upstream(name: str, count: int) -> list:
     url = "https://geocoding-api.open-meteo.com/v1/search"
     params = {
         "name": name,
-        "count": 1,
+        "count": count,
         "language": "en",
         "format": "json",
     }
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.get(url, params=params)
+    try:
+        resp = await http_get(url, params=params)
+    except httpx.HTTPError as exc:
+        raise GeocodingError(f"Geocoding API unreachable: {exc}")
 
     if resp.status_code != 200:
         raise GeocodingError(f"Geocoding API error: {resp.status_code} {resp.text}")
 
     data = resp.json()
-    results = data.get("results") or []
+    return data.get("results") or []
+
+
+async def _geocode_upstream(name: str) -> dict:
+    results = await _search_upstream(name, UPSTREAM_RESULT_COUNT)
     if not results:
         raise GeocodingError("No results found for this place name")
 
-    r = results[0]
-    return {
-        "name": r.get("name") or name,
-        "latitude": r["latitude"],
-        "longitude": r["longitude"],
-        "country": r.get("country"),
-        "timezone": r.get("timezone"),
-    }
+    try:
+        await asyncio.to_thread(_store_results, name, results)
+    except sqlite3.Error:
+        logger.exception("Geocoding store write failed")
+
+    return _as_place(results[0], name)
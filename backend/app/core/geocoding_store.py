@@ -0,0 +1,204 @@
+# app/core/geocoding_store.py
+"""
+Local geocoding store: a SQLite table of places with an FTS5 prefix index.
+
+Filled from upstream Open-Meteo results as they come in, and optionally
+bulk-seeded from a GeoNames dump (cities500.txt, cities15000.txt, ...):
+    python -m app.core.geocoding_store seed cities15000.txt
+"""
+from __future__ import annotations
+
+import csv
+import logging
+import re
+import sqlite3
+import sys
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.config import GEOCODE_DB
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS places (
+    id INTEGER PRIMARY KEY,          -- GeoNames id (Open-Meteo uses the same ids)
+    name TEXT NOT NULL,
+    name_norm TEXT NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    country TEXT,
+    admin1 TEXT,
+    timezone TEXT,
+    population INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_places_name_norm ON places (name_norm, population DESC);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS places_fts USING fts5(
+    name, content='places', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+);
+CREATE TRIGGER IF NOT EXISTS places_ai AFTER INSERT ON places BEGIN
+    INSERT INTO places_fts(rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS places_ad AFTER DELETE ON places BEGIN
+    INSERT INTO places_fts(places_fts, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS places_au AFTER UPDATE ON places BEGIN
+    INSERT INTO places_fts(places_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    INSERT INTO places_fts(rowid, name) VALUES (new.id, new.name);
+END;
+
+-- what upstream answered for a query we've already sent it
+CREATE TABLE IF NOT EXISTS geocode_queries (
+    query_norm TEXT PRIMARY KEY,
+    place_id INTEGER NOT NULL REFERENCES places(id) ON DELETE CASCADE
+);
+"""
+
+PLACE_COLUMNS = "p.name, p.latitude, p.longitude, p.country, p.admin1, p.timezone"
+
+
+def normalize(query: str) -> str:
+    return " ".join(query.split()).casefold()
+
+
+def _row_to_place(row) -> Dict[str, Any]:
+    name, lat, lon, country, admin1, tz = row
+    return {
+        "name": name,
+        "latitude": lat,
+        "longitude": lon,
+        "country": country,
+        "admin1": admin1,
+        "timezone": tz,
+    }
+
+
+class GeocodingStore:
+    def __init__(self, path: str):
+        self.path = path
+        # one connection shared behind a lock; every statement here is tiny
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def lookup(self, query: str) -> Optional[Dict[str, Any]]:
+        """Answer for a full query: what upstream said before, else an exact name match."""
+        q = normalize(query)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {PLACE_COLUMNS} FROM geocode_queries g"
+                " JOIN places p ON p.id = g.place_id WHERE g.query_norm = ?",
+                (q,),
+            ).fetchone()
+            if row is None:
+                row = self._conn.execute(
+                    f"SELECT {PLACE_COLUMNS} FROM places p WHERE p.name_norm = ?"
+                    " ORDER BY p.population DESC LIMIT 1",
+                    (q,),
+                ).fetchone()
+        return _row_to_place(row) if row else None
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Places whose name has words starting with every word of `prefix`."""
+        tokens = re.findall(r"\w+", prefix)
+        if not tokens:
+            return []
+        match = " ".join(f'"{t}"*' for t in tokens)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {PLACE_COLUMNS} FROM places_fts f JOIN places p ON p.id = f.rowid"
+                " WHERE places_fts MATCH ? ORDER BY p.population DESC LIMIT ?",
+                (match, limit),
+            ).fetchall()
+        return [_row_to_place(r) for r in rows]
+
+    def add_places(self, places: Iterable[Dict[str, Any]]) -> int:
+        rows = [
+            (
+                int(p["id"]),
+                p["name"],
+                normalize(p["name"]),
+                float(p["latitude"]),
+                float(p["longitude"]),
+                p.get("country"),
+                p.get("admin1"),
+                p.get("timezone"),
+                int(p.get("population") or 0),
+            )
+            for p in places
+        ]
+        with self._lock, self._conn:
+            # upsert, not REPLACE: REPLACE would delete the row (and its query mappings)
+            self._conn.executemany(
+                "INSERT INTO places"
+                " (id, name, name_norm, latitude, longitude, country, admin1, timezone, population)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(id) DO UPDATE SET name = excluded.name, name_norm = excluded.name_norm,"
+                " latitude = excluded.latitude, longitude = excluded.longitude,"
+                " country = excluded.country, admin1 = excluded.admin1,"
+                " timezone = excluded.timezone, population = excluded.population",
+                rows,
+            )
+        return len(rows)
+
+    def remember_query(self, query: str, place_id: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode_queries (query_norm, place_id) VALUES (?, ?)",
+                (normalize(query), int(place_id)),
+            )
+
+    def seed_geonames(self, path: str, batch_size: int = 5000) -> int:
+        """Load a GeoNames cities*.txt dump (tab separated, no header)."""
+        total = 0
+        batch: List[Dict[str, Any]] = []
+        with open(path, encoding="utf-8", newline="") as f:
+            for cols in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+                if len(cols) < 18:
+                    continue
+                batch.append(
+                    {
+                        "id": cols[0],
+                        "name": cols[1],
+                        "latitude": cols[4],
+                        "longitude": cols[5],
+                        "country": cols[8],
+                        "admin1": cols[10] or None,
+                        "population": cols[14] or 0,
+                        "timezone": cols[17] or None,
+                    }
+                )
+                if len(batch) >= batch_size:
+                    total += self.add_places(batch)
+                    batch = []
+        if batch:
+            total += self.add_places(batch)
+        return total
+
+
+_store: Optional[GeocodingStore] = None
+_store_lock = threading.Lock()
+
+
+def get_geocoding_store() -> GeocodingStore:
+    # opened on first use, so importing this (astro pool children, scripts)
+    # doesn't create GEOCODE_DB
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = GeocodingStore(GEOCODE_DB)
+    return _store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "seed":
+        sys.exit("usage: python -m app.core.geocoding_store seed cities15000.txt")
+    store = get_geocoding_store()
+    n = store.seed_geonames(sys.argv[2])
+    print(f"seeded {n} places into {store.path}")
@@ -0,0 +1,115 @@
+# app/core/http_client.py
+"""
+One pooled httpx.AsyncClient for the whole app instead of a new client (and
+a new DNS/TCP/TLS handshake) per upstream call. Opened and closed by the
+FastAPI lifespan in app/main.py.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import (
+    HTTP_BACKOFF_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_MAX_PER_HOST,
+    HTTP_RETRIES,
+    HTTP_TIMEOUT_SECONDS,
+)
+
+try:
+    import h2  # noqa: F401  (installed by httpx[http2])
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_client: Optional[httpx.AsyncClient] = None
+_host_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+def _new_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT_SECONDS,
+        http2=HTTP2,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=60.0,
+        ),
+        headers={"User-Agent": "AstroPlanner/1.0"},
+    )
+
+
+async def start_http_client() -> None:
+    global _client
+    if _client is None:
+        _client = _new_client()
+        _host_slots.clear()
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _host_slots.clear()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    # lifespan normally opens it; scripts/tests that skip the lifespan get one lazily
+    global _client
+    if _client is None:
+        _client = _new_client()
+    return _client
+
+
+def _host_slot(url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).netloc
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots[host] = asyncio.Semaphore(HTTP_MAX_PER_HOST)
+    return slot
+
+
+def _backoff(attempt: int) -> float:
+    # exponential backoff with full jitter
+    return random.uniform(0, HTTP_BACKOFF_SECONDS * (2 ** attempt))
+
+
+async def http_get(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    retries: int = HTTP_RETRIES,
+) -> httpx.Response:
+    """
+    GET through the shared client, at most HTTP_MAX_PER_HOST in flight per
+    host. Transport errors and 429/5xx are retried with backoff; the last
+    response (or exception) is returned/raised to the caller.
+    """
+    client = get_http_client()
+    attempt = 0
+    while True:
+        try:
+            async with _host_slot(url):
+                resp = await client.get(url, params=params)
+        except httpx.TransportError as exc:
+            if attempt >= retries:
+                raise
+            logger.warning("GET %s failed (%s), retrying", url, exc)
+        else:
+            if resp.status_code not in RETRY_STATUSES or attempt >= retries:
+                return resp
+            logger.warning("GET %s returned %s, retrying", url, resp.status_code)
+
+        await asyncio.sleep(_backoff(attempt))
+        attempt += 1
@@ -0,0 +1,85 @@
+# app/core/ics.py
+"""iCalendar rendering shared by the ICS export and the per-user feeds."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from app.models.location import Location
+from app.models.observation_session import ObservationSession
+
+
+def ics_escape(s: str) -> str:
+    # Minimal escaping for ICS fields
+    return (
+        s.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\n")
+        .replace("\n", "\\n")
+    )
+
+
+def ics_dt_utc(dt: datetime) -> str:
+    # Format as UTC "YYYYMMDDTHHMMSSZ"
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    dt = dt.astimezone(timezone.utc)
+    return dt.strftime("%Y%m%dT%H%M%SZ")
+
+
+ICS_HEADER = (
+    "BEGIN:VCALENDAR\r\n"
+    "VERSION:2.0\r\n"
+    "PRODID:-//AstroPlanner//EN\r\n"
+    "CALSCALE:GREGORIAN\r\n"
+    "METHOD:PUBLISH\r\n"
+    "X-WR-CALNAME:AstroPlanner Sessions\r\n"
+)
+ICS_FOOTER = "END:VCALENDAR\r\n"
+
+
+def render_vevent(s: ObservationSession, loc: Optional[Location], dur: timedelta) -> str:
+    """One VEVENT, CRLF-terminated. Depends only on the session and its location."""
+    dt_start = s.scheduled_start
+    if isinstance(dt_start, str):
+        dt_start = datetime.fromisoformat(dt_start)
+    dt_end = dt_start + dur
+
+    loc_name = loc.name if loc else ""
+    loc_coords = ""
+    if loc and loc.latitude is not None and loc.longitude is not None:
+        loc_coords = f"{loc.latitude},{loc.longitude}"
+
+    summary = f"Observe: {s.target_name}"
+    description = f"Status: {s.status}"
+    if loc_coords:
+        description += f"\\nCoords: {loc_coords}"
+
+    uid = f"session-{s.id}@astroplanner"
+    # last change rather than "now", so unchanged calendars render byte-identical
+    stamp = s.updated_at or s.created_at or dt_start
+
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{ics_escape(uid)}",
+        f"DTSTAMP:{ics_dt_utc(stamp)}",
+        f"DTSTART:{ics_dt_utc(dt_start)}",
+        f"DTEND:{ics_dt_utc(dt_end)}",
+        f"SUMMARY:{ics_escape(summary)}",
+        f"DESCRIPTION:{ics_escape(description)}",
+    ]
+
+    if loc_name:
+        lines.append(f"LOCATION:{ics_escape(loc_name)}")
+
+    # Optional: reflect status in iCal terms
+    if s.status == "cancelled":
+        lines.append("STATUS:CANCELLED")
+    elif s.status == "completed":
+        lines.append("STATUS:CONFIRMED")
+    else:
+        lines.append("STATUS:TENTATIVE")
+
+    lines.append("END:VEVENT")
+    return "\r\n".join(lines) + "\r\n"
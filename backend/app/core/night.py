@@ -0,0 +1,122 @@
+# app/core/night.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from skyfield import almanac
+from skyfield.api import wgs84
+
+from app.core.cache import TTLCache
+from app.core.ephemeris import get_ephemeris, get_timescale
+
+
+@dataclass(frozen=True)
+class NightEvents:
+    """
+    Twilight / Moon events for the night that STARTS on `date` (local noon to
+    local noon). Any event that doesn't happen that night is None, e.g. no
+    astronomical dusk in a high-latitude summer.
+    """
+    date: date
+    timezone: str
+    sunset: Optional[datetime] = None
+    civil_dusk: Optional[datetime] = None
+    nautical_dusk: Optional[datetime] = None
+    astronomical_dusk: Optional[datetime] = None
+    astronomical_dawn: Optional[datetime] = None
+    nautical_dawn: Optional[datetime] = None
+    civil_dawn: Optional[datetime] = None
+    sunrise: Optional[datetime] = None
+    moonrise: Optional[datetime] = None
+    moonset: Optional[datetime] = None
+    moon_illumination: float = 0.0  # fraction lit at the middle of the night
+
+
+# Root-finding is the expensive part, and the answer for a (site, date) never
+# changes, so this is a plain LRU. ~1 km rounding moves events by seconds.
+_night_cache = TTLCache(maxsize=4096)
+COORD_DECIMALS = 2
+
+
+def _night_tz(longitude: float, tz_name: Optional[str]) -> tzinfo:
+    if tz_name:
+        return ZoneInfo(tz_name)
+    # no zone known: local mean solar time, good enough to pick "which night"
+    return timezone(timedelta(hours=round(longitude / 15.0)))
+
+
+def night_window(longitude: float, day: date, tz_name: Optional[str]) -> tuple[datetime, datetime]:
+    """UTC bounds of local noon on `day` -> local noon the next day."""
+    tz = _night_tz(longitude, tz_name)
+    start = datetime.combine(day, time(12, 0), tzinfo=tz)
+    end = datetime.combine(day + timedelta(days=1), time(12, 0), tzinfo=tz)
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+
+def _compute_night(latitude: float, longitude: float, day: date, tz_name: Optional[str]) -> NightEvents:
+    start_utc, end_utc = night_window(longitude, day, tz_name)
+    ts = get_timescale()
+    eph = get_ephemeris()
+    t0 = ts.from_datetime(start_utc)
+    t1 = ts.from_datetime(end_utc)
+    topos = wgs84.latlon(latitude, longitude)
+
+    ev = {}
+
+    # dark_twilight_day(): 4 day, 3 civil, 2 nautical, 1 astronomical, 0 night
+    f = almanac.dark_twilight_day(eph.kernel, topos)
+    times, levels = almanac.find_discrete(t0, t1, f)
+    prev = int(f(t0))
+    for t, level in zip(times, levels):
+        level = int(level)
+        when = t.utc_datetime()
+        # a single step can cross several boundaries, so test each one
+        for boundary, dusk, dawn in (
+            (4, "sunset", "sunrise"),
+            (3, "civil_dusk", "civil_dawn"),
+            (2, "nautical_dusk", "nautical_dawn"),
+            (1, "astronomical_dusk", "astronomical_dawn"),
+        ):
+            if prev >= boundary > level:
+                ev.setdefault(dusk, when)
+            elif level >= boundary > prev:
+                ev.setdefault(dawn, when)
+        prev = level
+
+    f = almanac.risings_and_settings(eph.kernel, eph.moon, topos)
+    times, ups = almanac.find_discrete(t0, t1, f)
+    for t, up in zip(times, ups):
+        ev.setdefault("moonrise" if up else "moonset", t.utc_datetime())
+
+    mid = ev.get("sunset") or start_utc
+    mid = mid + ((ev.get("sunrise") or end_utc) - mid) / 2
+    illum = float(almanac.fraction_illuminated(eph.kernel, "moon", ts.from_datetime(mid)))
+
+    return NightEvents(
+        date=day,
+        timezone=tz_name or str(_night_tz(longitude, None)),
+        moon_illumination=illum,
+        **ev,
+    )
+
+
+def night_events(
+    latitude: float,
+    longitude: float,
+    day: date,
+    tz_name: Optional[str] = None,
+) -> NightEvents:
+    lat = round(latitude, COORD_DECIMALS)
+    lon = round(longitude, COORD_DECIMALS)
+    key = (lat, lon, day, tz_name)
+
+    cached = _night_cache.get(key)
+    if cached is not None:
+        return cached
+
+    events = _compute_night(lat, lon, day, tz_name)
+    _night_cache.set(key, events)
+    return events
@@ -0,0 +1,82 @@
+# app/core/pagination.py
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+Bodies stay plain JSON arrays; the cursor for the next page and, on
+request (include_total=true), the total go in response headers. Paging starts when the client sends `limit` or
+`cursor`; without either the whole list comes back, as it always did.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from fastapi import HTTPException, Response
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> List[Any]:
+    # values come back typed like the key columns (datetime / int)
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [
+            datetime.fromisoformat(v) if col.type.python_type is datetime else col.type.python_type(v)
+            for col, v in zip(columns, values)
+        ]
+    except (ValueError, TypeError, NotImplementedError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def paginate(
+    db: AsyncSession,
+    stmt: Select,
+    keys: Sequence[Any],
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    descending: bool = True,
+    include_total: bool = False,
+) -> list:
+    """
+    One page of `stmt` ordered by the `keys` columns (last one unique, e.g. id).
+    Sets X-Next-Cursor when there is more. X-Total-Count (all pages, filters
+    applied) costs one more COUNT query, so only with include_total. With
+    neither cursor nor limit, returns every row (clients that predate paging).
+    """
+    if include_total:
+        total = await db.scalar(select(func.count()).select_from(stmt.order_by(None).subquery()))
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+
+    if cursor:
+        after = tuple(decode_cursor(cursor, keys))  # bound with the key columns' types
+        stmt = stmt.where(tuple_(*keys) < after if descending else tuple_(*keys) > after)
+
+    order = [k.desc() if descending else k.asc() for k in keys]
+    if limit is None and not cursor:
+        return (await db.scalars(stmt.order_by(*order))).all()
+    limit = limit or DEFAULT_PAGE_SIZE
+    rows = (await db.scalars(stmt.order_by(*order).limit(limit + 1))).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([getattr(last, k.key) for k in keys])
+    return rows
@@ -0,0 +1,181 @@
+# app/core/planning.py
+"""
+Target scoring and site/night planning shared by the targets and planner
+routers: the deep-sky catalog, the visibility rules and score, night
+lookup, catalog window ranking and the per-site night summary.
+
+Functions here take plain values or a Site, so they can run in the
+astronomy process pool.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import List, NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+from fastapi import HTTPException
+
+from app.core.catalog import load_catalog
+from app.core.ephemeris import get_timescale
+from app.core.night import NightEvents, night_events, night_window
+from app.core.sky import local_sidereal_hours, radec_of_date, sky_series, transit_table
+from app.models.location import Location
+
+
+# Deep-sky catalog (memory-mapped .npy, or the built-in list), loaded once
+CATALOG = load_catalog()
+
+# horizon limit for catalog objects; also what the index culls against
+DSO_MIN_ALT = 15.0
+
+
+class Site(NamedTuple):
+    """The bits of a Location the sky math needs; picklable, for the astronomy pool."""
+    latitude: float
+    longitude: float
+    timezone: Optional[str] = None
+
+    @classmethod
+    def of(cls, loc: Location) -> "Site":
+        return cls(loc.latitude, loc.longitude, loc.timezone)
+
+
+def visibility_score(alt, sun_alt, elong, kind: str):
+    # higher altitude + darker sky + better elongation
+    # works on plain floats and on numpy arrays (curves)
+    s = 0.0
+    s += np.clip(alt, 0.0, 90.0) * 1.2
+    s += np.clip(-np.asarray(sun_alt), 0.0, 18.0) * 1.0  # darker better
+    if elong is not None:
+        s += np.clip(elong, 0.0, 60.0) * 0.3
+    if kind in ("planet", "moon"):
+        s += 5.0  # bump popular targets a bit
+    return s
+
+
+def visibility_mask(name: str, kind: str, alt, sun_alt, elong=None):
+    # array version of the rules /targets/visible applies per target
+    if kind == "moon":
+        return (alt > 5) & (sun_alt < 0)
+    if kind == "planet":
+        mask = (alt >= 10) & (sun_alt <= -3)
+        if name in ("Mercury", "Venus") and elong is not None:
+            mask &= elong >= 12
+        return mask
+    return (alt >= DSO_MIN_ALT) & (sun_alt <= -6)
+
+
+def filter_mag(idx: np.ndarray, max_mag: Optional[float]) -> np.ndarray:
+    if max_mag is None:
+        return idx
+    return idx[CATALOG.mag[idx] <= max_mag]  # NaN (unknown) never passes
+
+
+def night_for(loc: Site, night: Optional[date], tz: Optional[str]):
+    tz_name = tz or loc.timezone
+    if tz_name:
+        try:
+            local_tz = ZoneInfo(tz_name)
+        except ZoneInfoNotFoundError:
+            raise HTTPException(status_code=400, detail="Invalid timezone")
+    else:
+        local_tz = timezone.utc
+
+    if night is None:
+        night = datetime.now(local_tz).date()
+
+    return night_events(loc.latitude, loc.longitude, night, tz_name)
+
+# Sun altitude that counts as dark enough, per twilight level
+DARKNESS_SUN_ALT = {"civil": -6.0, "nautical": -12.0, "astronomical": -18.0}
+
+
+def catalog_window_scores(
+    latitude: float,
+    longitude: float,
+    dark_start: datetime,
+    dark_end: datetime,
+    min_alt: float,
+    max_mag: Optional[float],
+):
+    """
+    (catalog indices, TransitTable, score) for every object that can clear
+    min_alt, scored at its best point inside [dark_start, dark_end].
+    Objects with no window there score -inf.
+    """
+    idx = filter_mag(CATALOG.ever_above(latitude, min_alt), max_mag)
+    ref = dark_start + (dark_end - dark_start) / 2
+    t_ref = get_timescale().from_datetime(ref)
+    ra, dec = radec_of_date(CATALOG.ra_hours[idx], CATALOG.dec_deg[idx], t_ref)
+    lst = local_sidereal_hours(latitude, longitude, t_ref)
+    half = (dark_end - dark_start).total_seconds() / 7200
+    table = transit_table(ra, dec, latitude, lst, -half, half, min_alt)
+    score = np.where(
+        np.isnan(table.best),
+        -np.inf,
+        visibility_score(np.nan_to_num(table.best_alt_deg), -18.0, None, "dso"),
+    )
+    return idx, table, score
+
+
+@dataclass
+class SiteSky:
+    """What the sky offers at one site for one night (weather not included)."""
+    night: NightEvents
+    dark_start: Optional[datetime]
+    dark_end: Optional[datetime]
+    dark_hours: float
+    moon_up_fraction: float  # share of the dark time with the Moon above the horizon
+    target_score: float  # mean score of the top targets
+    top_targets: List[Tuple[str, float]] = field(default_factory=list)
+
+
+SITE_GRID_MINUTES = 10
+
+
+def site_sky(
+    latitude: float,
+    longitude: float,
+    tz_name: Optional[str],
+    day: date,
+    darkness: str,
+    min_alt: float,
+    max_mag: Optional[float],
+    top: int,
+) -> SiteSky:
+    # plain arguments only: this runs in the astronomy process pool
+    events = night_events(latitude, longitude, day, tz_name)
+    start, end = night_window(longitude, events.date, tz_name)
+    dusk = getattr(events, f"{darkness}_dusk")
+    dawn = getattr(events, f"{darkness}_dawn")
+    # no dusk/dawn (polar night, midnight sun): the Sun mask below decides
+    start, end = dusk or start, dawn or end
+
+    step_s = SITE_GRID_MINUTES * 60
+    offsets = np.arange(int((end - start).total_seconds() // step_s) + 1) * step_s
+    t = get_timescale().utc(start.year, start.month, start.day, start.hour, start.minute, start.second + offsets)
+    series = sky_series(latitude, longitude, t)
+    dark = series.sun_alt_deg <= DARKNESS_SUN_ALT[darkness]
+    n_dark = int(dark.sum())
+
+    site = SiteSky(
+        night=events,
+        dark_start=dusk,
+        dark_end=dawn,
+        dark_hours=n_dark * SITE_GRID_MINUTES / 60,
+        moon_up_fraction=float((dark & (series.moon.alt_deg > 0)).sum() / n_dark) if n_dark else 0.0,
+        target_score=0.0,
+    )
+    if not n_dark:
+        return site
+
+    dark_times = start + timedelta(seconds=float(offsets[dark][0])), start + timedelta(seconds=float(offsets[dark][-1]))
+    idx, _, score = catalog_window_scores(latitude, longitude, *dark_times, min_alt, max_mag)
+    best = np.argsort(-score, kind="stable")[:top]
+    best = best[np.isfinite(score[best])]
+    site.top_targets = [(str(CATALOG.names[idx[i]]), float(score[i])) for i in best]
+    if site.top_targets:
+        site.target_score = float(np.mean(score[best]))
+    return site
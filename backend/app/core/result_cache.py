@@ -0,0 +1,134 @@
+# app/core/result_cache.py
+"""
+Cache for computed endpoint results (JSON-able values keyed by a string).
+
+An in-memory LRU+TTL per process; optionally backed by a small SQLite file
+shared by every worker on the box, the same way the forecast cache does it.
+Concurrent misses for one key share a single computation.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.cache import TTLCache
+from app.core.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# how a request was answered (also the X-Cache header values)
+HIT = "HIT"
+MISS = "MISS"
+COALESCED = "COALESCED"
+
+
+class ResultCache:
+    def __init__(self, name: str, maxsize: int, ttl: float, db_path: Optional[str] = None):
+        self.name = name
+        self.ttl = ttl
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._flight = SingleFlight()
+        self._db_path = db_path or None
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0  # found in the SQLite file, not this process
+        self.coalesced = 0  # joined a computation already in flight
+        self.misses = 0
+        if self._db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS result_cache ("
+                    " key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+                )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._db_path, timeout=5.0)
+
+    def _db_key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    def _disk_get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._db_lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT expires_at, value FROM result_cache WHERE key = ?",
+                (self._db_key(key),),
+            ).fetchone()
+        if row is None or row[0] <= time.time():
+            return None
+        return json.loads(row[1]), row[0] - time.time()
+
+    def _disk_set(self, key: str, value: Any) -> None:
+        with self._db_lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, expires_at, value) VALUES (?, ?, ?)",
+                (self._db_key(key), time.time() + self.ttl, json.dumps(value)),
+            )
+            conn.execute("DELETE FROM result_cache WHERE expires_at <= ?", (time.time(),))
+
+    async def _lookup(self, key: str) -> Optional[Any]:
+        if not self._db_path:
+            return None
+        try:
+            found = await asyncio.to_thread(self._disk_get, key)
+        except sqlite3.Error:
+            logger.exception("Result cache (%s) read failed", self.name)
+            return None
+        if found is None:
+            return None
+        value, ttl = found
+        self._memory.set(key, value, ttl=ttl)
+        return value
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        # runs once per key for everyone waiting on the flight
+        value = await self._lookup(key)
+        if value is not None:
+            self.shared_hits += 1
+            return value, HIT
+        self.misses += 1
+        value = await compute()
+        self._memory.set(key, value)
+        if self._db_path:
+            try:
+                await asyncio.to_thread(self._disk_set, key, value)
+            except sqlite3.Error:
+                logger.exception("Result cache (%s) write failed", self.name)
+        return value, MISS
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """
+        (value, HIT / MISS / COALESCED). COALESCED: another request was
+        already computing it and this one waited for that result.
+        `compute` must return something json.dumps can take.
+        """
+        value = self._memory.get(key)
+        if value is not None:
+            self.hits += 1
+            return value, HIT
+        if key in self._flight:
+            self.coalesced += 1
+            value, _ = await self._flight.do(key, lambda: self._compute(key, compute))
+            return value, COALESCED
+        return await self._flight.do(key, lambda: self._compute(key, compute))
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.hits + self.shared_hits
+        total = hits + self.coalesced + self.misses
+        return {
+            "hits": hits,
+            "shared_hits": self.shared_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            # requests answered without a computation of their own
+            "hit_rate": round((hits + self.coalesced) / total, 4) if total else None,
+            "size": len(self._memory),
+            "shared": bool(self._db_path),
+        }
+
+    def clear(self) -> None:
+        self._memory.clear()
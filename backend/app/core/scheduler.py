@@ -0,0 +1,145 @@
+# app/core/scheduler.py
+"""
+Fits a night's targets into back-to-back sessions.
+
+Input is a (targets x time slots) score grid with a feasibility mask (above
+the altitude limit, dark enough); every session is `length` slots long and
+is followed by `gap` slots of slew/setup. Each target is used at most once.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Block:
+    target: int  # row in the score grid
+    start: int  # first slot
+    value: float  # mean score over the block
+
+
+def block_values(score: np.ndarray, feasible: np.ndarray, length: int) -> np.ndarray:
+    """
+    Mean score of every `length`-slot block, shape (n_targets, n_slots - length + 1).
+    -inf where the target is infeasible in any slot of the block.
+    """
+    n_targets, n_slots = score.shape
+    if length > n_slots:
+        return np.full((n_targets, 0), -np.inf)
+    pad = np.zeros((n_targets, 1))
+    s = np.concatenate([pad, np.cumsum(np.where(feasible, score, 0.0), axis=1)], axis=1)
+    bad = np.concatenate([pad, np.cumsum(~feasible, axis=1)], axis=1)
+    total = s[:, length:] - s[:, :-length]
+    blocked = (bad[:, length:] - bad[:, :-length]) > 0
+    return np.where(blocked, -np.inf, total / length)
+
+
+def _best_schedule(best: np.ndarray, step: int, max_blocks: int) -> List[int]:
+    """
+    Weighted interval scheduling over time, at most max_blocks blocks:
+    V[k, c] = best total using starts >= k and at most c blocks.
+    """
+    n = len(best)
+    V = np.zeros((n + step + 1, max_blocks + 1))
+    take = np.zeros((n, max_blocks + 1), dtype=bool)
+    for k in range(n - 1, -1, -1):
+        skip = V[k + 1]
+        if np.isfinite(best[k]):
+            use = np.concatenate([[-np.inf], best[k] + V[k + step, :-1]])
+            take[k] = use > skip
+            V[k] = np.maximum(skip, use)
+        else:
+            V[k] = skip
+
+    starts: List[int] = []
+    k, c = 0, max_blocks
+    while k < n and c > 0:
+        if take[k, c]:
+            starts.append(k)
+            k += step
+            c -= 1
+        else:
+            k += 1
+    return starts
+
+
+def _exact_schedule(values: np.ndarray, step: int, max_blocks: int) -> List[Block]:
+    """
+    DP over (slot, set of targets already used), vectorized over the sets:
+    V[k, m] = best total from slot k on when the targets in bitmask m are taken.
+    2**n_targets states per slot, so only for short target lists.
+    """
+    n_targets, n = values.shape
+    masks = np.arange(1 << n_targets)
+    room = np.array([bin(m).count("1") for m in masks]) < max_blocks
+    V = np.zeros((n + step + 1, len(masks)))
+    choice = np.full((n, len(masks)), -1, dtype=np.int8)
+    for k in range(n - 1, -1, -1):
+        V[k] = V[k + 1]
+        for j in range(n_targets):
+            if not np.isfinite(values[j, k]):
+                continue
+            bit = 1 << j
+            use = np.where((masks & bit == 0) & room, values[j, k] + V[k + step, masks | bit], -np.inf)
+            better = use > V[k]
+            V[k] = np.where(better, use, V[k])
+            choice[k] = np.where(better, j, choice[k])
+
+    blocks: List[Block] = []
+    k, m = 0, 0
+    while k < n:
+        j = int(choice[k, m])
+        if j < 0:
+            k += 1
+            continue
+        blocks.append(Block(j, k, float(values[j, k])))
+        m |= 1 << j
+        k += step
+    return blocks
+
+
+# up to this many targets the exact DP is cheap (2**12 states per slot)
+EXACT_MAX_TARGETS = 12
+
+
+def schedule(values: np.ndarray, length: int, gap: int, max_blocks: int) -> List[Block]:
+    """
+    Blocks maximizing the total value, non-overlapping with `gap` slots in
+    between, each target at most once.
+
+    Short target lists (named targets) are solved exactly. For longer ones
+    (best-N from the catalog) the DP takes the best target per start slot;
+    when that picks a target twice, the target keeps only its best start and
+    the DP reruns. Every rerun removes options, so this ends after at most
+    n_targets rounds. With many candidates there is nearly always a
+    comparable target to fill a slot, so little is lost.
+    """
+    values = values.copy()
+    n_targets = values.shape[0]
+    if values.size == 0 or max_blocks <= 0:
+        return []
+    if n_targets <= EXACT_MAX_TARGETS:
+        return _exact_schedule(values, length + gap, max_blocks)
+
+    for _ in range(n_targets + 1):
+        choice = np.argmax(values, axis=0)
+        best = values[choice, np.arange(values.shape[1])]
+        starts = _best_schedule(best, length + gap, max_blocks)
+
+        blocks = [Block(int(choice[k]), k, float(best[k])) for k in starts]
+        by_target: dict[int, List[Block]] = {}
+        for b in blocks:
+            by_target.setdefault(b.target, []).append(b)
+        repeated = {t: bs for t, bs in by_target.items() if len(bs) > 1}
+        if not repeated:
+            return blocks
+        for t, bs in repeated.items():
+            keep = max(bs, key=lambda b: b.value).start
+            kept = values[t, keep]
+            values[t, :] = -np.inf
+            values[t, keep] = kept
+
+    return []  # not reached
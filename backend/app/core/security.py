@@ -1,16 +1,34 @@
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
 
-from jose import jwt
+from jose import JWTError, jwt
 from passlib.context import CryptContext
 
-from app.core.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.config import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    ALGORITHM,
+    PASSWORD_HASH_ROUNDS,
+    PASSWORD_HASH_WORKERS,
+    SECRET_KEY,
+)
 
 pwd_context = CryptContext(
     schemes=["pbkdf2_sha256"],
     deprecated="auto",
+    pbkdf2_sha256__default_rounds=PASSWORD_HASH_ROUNDS,
+    # anything hashed with other rounds counts as outdated -> rehashed at login
+    pbkdf2_sha256__min_desired_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__max_desired_rounds=PASSWORD_HASH_ROUNDS,
 )
 
+# KDF work gets its own small pool so a burst of logins can't take over the
+# threadpool the rest of the API runs sync code on. hashlib's PBKDF2 releases
+# the GIL, so threads are enough to use several cores.
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -20,8 +38,33 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def _on_hash_pool(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, fn, *args)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _on_hash_pool(pwd_context.hash, password)
+
+
+async def verify_and_update_async(password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """
+    (ok, new_hash): new_hash is set when the stored hash uses outdated
+    parameters and should be replaced. With no stored hash (unknown user) a
+    dummy verify still runs, so response time doesn't reveal which emails exist.
+    """
+    if hashed_password is None:
+        await _on_hash_pool(pwd_context.dummy_verify)
+        return False, None
+    return await _on_hash_pool(pwd_context.verify_and_update, password, hashed_password)
+
+
+def new_token_id() -> str:
+    return uuid.uuid4().hex
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
+    to_encode.setdefault("jti", new_token_id())  # lets a single token be revoked
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
@@ -32,3 +75,58 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+
+def decode_access_token(token: str) -> Optional[dict]:
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+
+# Refresh tokens get their own key too, so one can never pass as an access token
+REFRESH_TOKEN_KEY = SECRET_KEY + ":refresh"
+
+
+def create_refresh_token(user_id: int, jti: str, family: str, expires_at: datetime) -> str:
+    claims = {"sub": str(user_id), "jti": jti, "fam": family, "exp": expires_at, "scope": "refresh"}
+    return jwt.encode(claims, REFRESH_TOKEN_KEY, algorithm=ALGORITHM)
+
+
+def decode_refresh_token(token: str) -> Optional[dict]:
+    """Verified claims (sub, jti, fam) or None. Whether it's still usable is the DB's call."""
+    try:
+        payload = jwt.decode(token, REFRESH_TOKEN_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("scope") != "refresh" or not payload.get("jti") or not payload.get("fam"):
+        return None
+    return payload
+
+
+# Calendar feed tokens live in subscription URLs, so they're signed with a
+# key of their own: a leaked feed URL can't be replayed as an API token.
+FEED_TOKEN_KEY = SECRET_KEY + ":calendar-feed"
+
+
+def create_feed_token(user_id: int, version: int) -> str:
+    # no expiry: calendar apps keep the URL forever. `ver` is the user's
+    # feed_token_version; regenerating the link bumps it and revokes this one
+    return jwt.encode(
+        {"sub": str(user_id), "scope": "calendar", "ver": version}, FEED_TOKEN_KEY, algorithm=ALGORITHM
+    )
+
+
+def decode_feed_token(token: str) -> Optional[Tuple[int, int]]:
+    """(user id, feed token version) or None. Whether the version is current is the DB's call."""
+    try:
+        payload = jwt.decode(token, FEED_TOKEN_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("scope") != "calendar":
+        return None
+    try:
+        # links issued before versioning carry no `ver`: version 0
+        return int(payload.get("sub")), int(payload.get("ver", 0))
+    except (TypeError, ValueError):
+        return None
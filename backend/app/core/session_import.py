@@ -0,0 +1,72 @@
+# app/core/session_import.py
+"""
+Row parsing for bulk session import: a JSON array, NDJSON (one object per
+line) or CSV with a header row. Columns are SessionCreate's fields; blank
+CSV cells count as missing.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Any, Dict, List, Optional
+
+JSON_TYPES = {"application/json"}
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+CSV_TYPES = {"text/csv", "application/csv"}
+
+EXTENSIONS = {".json": "application/json", ".ndjson": "application/x-ndjson", ".jsonl": "application/x-ndjson", ".csv": "text/csv"}
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def media_type(content_type: Optional[str], filename: Optional[str] = None) -> str:
+    """Normalized media type, falling back to the upload's file extension."""
+    mt = (content_type or "").split(";", 1)[0].strip().lower()
+    if mt in JSON_TYPES | NDJSON_TYPES | CSV_TYPES:
+        return mt
+    if filename:
+        for ext, guessed in EXTENSIONS.items():
+            if filename.lower().endswith(ext):
+                return guessed
+    return mt
+
+
+def parse_rows(data: bytes, content_type: str) -> List[Dict[str, Any]]:
+    try:
+        text = data.decode("utf-8-sig")  # spreadsheets like to add a BOM
+    except UnicodeDecodeError:
+        raise ImportFormatError("Body is not UTF-8")
+
+    if content_type in JSON_TYPES:
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as exc:
+            raise ImportFormatError(f"Invalid JSON: {exc}")
+        if not isinstance(rows, list):
+            raise ImportFormatError("Expected a JSON array of sessions")
+        return rows
+
+    if content_type in NDJSON_TYPES:
+        rows = []
+        for n, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as exc:
+                raise ImportFormatError(f"Invalid JSON on line {n}: {exc}")
+        return rows
+
+    if content_type in CSV_TYPES:
+        reader = csv.DictReader(io.StringIO(text, newline=""))
+        if not reader.fieldnames:
+            return []
+        return [
+            {k.strip(): v.strip() for k, v in row.items() if k and v is not None and v.strip()}
+            for row in reader
+        ]
+
+    raise ImportFormatError("Send a JSON array, NDJSON or CSV")
@@ -0,0 +1,52 @@
+# app/core/singleflight.py
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Deduplicate identical in-flight async calls: the first caller for a key
+    starts the work, everyone arriving before it finishes awaits the same
+    task and gets the same result or the same exception (WeatherError,
+    GeocodingError, ...). Nothing is kept once the call completes; caching
+    is the caller's job.
+
+    The work runs as its own task and callers await it through shield(), so
+    a caller that disconnects doesn't cancel the call for everyone else.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        return await asyncio.shield(self.join(key, fn))
+
+    def join(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> "asyncio.Future[T]":
+        """
+        The task for key, starting fn() if nothing is in flight. Synchronous,
+        so a caller can register several keys before it first awaits; await
+        the result through shield() like do() does.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+        return task
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter went away
+
+    def __contains__(self, key: Hashable) -> bool:
+        # a call for key is in flight; do() would join it
+        return key in self._calls
+
+    def __len__(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,269 @@
+# app/core/sky.py
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+from skyfield.api import wgs84, Star
+
+from app.core.ephemeris import get_ephemeris
+
+
+# sidereal hours per solar hour
+SIDEREAL_RATE = 1.002737909350795
+
+# altitude of a star's centre at rise/set, standard refraction
+HORIZON_DEG = -0.5667
+
+
+def local_sidereal_hours(latitude: float, longitude: float, t):
+    return wgs84.latlon(latitude, longitude).lst_hours_at(t)
+
+
+def radec_of_date(ra_hours, dec_deg, t) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rotate catalog (ICRS/J2000) RA/Dec to the true equator and equinox of `t`
+    with Skyfield's precession-nutation matrix. Skips aberration (~20") and
+    light-time, which is ~1000x cheaper than an array-Star observe() and
+    plenty for rise/set/altitude work on fixed objects.
+    """
+    ra = np.radians(np.asarray(ra_hours) * 15.0)
+    dec = np.radians(dec_deg)
+    v = np.array([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)])
+    x, y, z = np.asarray(t.M) @ v
+    ra_date = np.mod(np.degrees(np.arctan2(y, x)) / 15.0, 24.0)
+    dec_date = np.degrees(np.arcsin(np.clip(z, -1.0, 1.0)))
+    return np.atleast_1d(ra_date), np.atleast_1d(dec_date)
+
+
+@dataclass
+class BodyPosition:
+    name: str
+    alt_deg: float
+    az_deg: float
+    elong_deg: Optional[float] = None
+
+
+@dataclass
+class SkySnapshot:
+    sun_alt_deg: float
+    planets: List[BodyPosition] = field(default_factory=list)
+    moon: Optional[BodyPosition] = None
+    # parallel to the rows of the fixed (array-valued) Star
+    fixed_alt_deg: np.ndarray = field(default_factory=lambda: np.empty(0))
+    fixed_az_deg: np.ndarray = field(default_factory=lambda: np.empty(0))
+
+
+def sky_snapshot(
+    latitude: float,
+    longitude: float,
+    t,
+    fixed: Optional[Star] = None,
+) -> SkySnapshot:
+    """
+    Everything /targets/visible needs for one instant, in one pass:
+    - the observer position is computed once and reused for every body
+    - the Sun is observed once; planet elongations reuse that vector
+    - every fixed RA/Dec target is observed in one array-valued call
+    """
+    eph = get_ephemeris()
+    observer = eph.earth + wgs84.latlon(latitude, longitude)
+    obs_at = observer.at(t)
+
+    sun_app = obs_at.observe(eph.sun).apparent()
+    sun_alt, _, _ = sun_app.altaz()
+    snap = SkySnapshot(sun_alt_deg=float(sun_alt.degrees))
+
+    for name, body in eph.planets.items():
+        app = obs_at.observe(body).apparent()
+        alt, az, _ = app.altaz()
+        snap.planets.append(
+            BodyPosition(
+                name=name,
+                alt_deg=float(alt.degrees),
+                az_deg=float(az.degrees),
+                elong_deg=float(app.separation_from(sun_app).degrees),
+            )
+        )
+
+    moon_alt, moon_az, _ = obs_at.observe(eph.moon).apparent().altaz()
+    snap.moon = BodyPosition(
+        name="Moon",
+        alt_deg=float(moon_alt.degrees),
+        az_deg=float(moon_az.degrees),
+    )
+
+    if fixed is not None:
+        alt, az, _ = obs_at.observe(fixed).apparent().altaz()
+        snap.fixed_alt_deg = np.atleast_1d(alt.degrees)
+        snap.fixed_az_deg = np.atleast_1d(az.degrees)
+
+    return snap
+
+
+@dataclass
+class BodySeries:
+    name: str
+    alt_deg: np.ndarray
+    az_deg: np.ndarray
+    elong_deg: Optional[np.ndarray] = None
+
+
+@dataclass
+class SkySeries:
+    sun_alt_deg: np.ndarray
+    planets: List[BodySeries] = field(default_factory=list)
+    moon: Optional[BodySeries] = None
+    # shape (n_fixed, n_times), rows parallel to the fixed Star
+    fixed_alt_deg: np.ndarray = field(default_factory=lambda: np.empty((0, 0)))
+    fixed_az_deg: np.ndarray = field(default_factory=lambda: np.empty((0, 0)))
+
+
+def hadec_to_altaz(ha_hours, dec_deg, lat_deg) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Plain spherical trig, broadcasting over numpy arrays.
+    Azimuth is measured from north through east, like Skyfield's altaz().
+    """
+    ha = np.radians(np.asarray(ha_hours) * 15.0)
+    dec = np.radians(dec_deg)
+    lat = np.radians(lat_deg)
+
+    sin_alt = np.sin(dec) * np.sin(lat) + np.cos(dec) * np.cos(lat) * np.cos(ha)
+    alt = np.arcsin(np.clip(sin_alt, -1.0, 1.0))
+    az = np.arctan2(
+        -np.cos(dec) * np.sin(ha),
+        np.sin(dec) * np.cos(lat) - np.cos(dec) * np.sin(lat) * np.cos(ha),
+    )
+    return np.degrees(alt), np.degrees(az) % 360.0
+
+
+def semi_diurnal_arc(dec_deg, lat_deg, alt_deg) -> np.ndarray:
+    """
+    Hour angle (sidereal hours) at which objects cross alt_deg.
+    NaN if they never get that high, 12.0 if they never drop below it.
+    """
+    dec = np.radians(dec_deg)
+    lat = np.radians(lat_deg)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cos_h = (np.sin(np.radians(alt_deg)) - np.sin(lat) * np.sin(dec)) / (np.cos(lat) * np.cos(dec))
+    h = np.degrees(np.arccos(np.clip(cos_h, -1.0, 1.0))) / 15.0
+    h = np.where(cos_h > 1.0, np.nan, h)
+    return np.where(cos_h < -1.0, 12.0, h)
+
+
+@dataclass
+class TransitTable:
+    # all times are solar hours relative to the reference instant
+    transit: np.ndarray
+    transit_alt_deg: np.ndarray
+    rise: np.ndarray  # NaN when circumpolar or never rising
+    set: np.ndarray
+    window_start: np.ndarray  # NaN when never above min_alt in the dark window
+    window_end: np.ndarray
+    best: np.ndarray
+    best_alt_deg: np.ndarray
+
+
+def transit_table(
+    ra_hours: np.ndarray,
+    dec_deg: np.ndarray,
+    lat_deg: float,
+    lst_ref_hours: float,
+    dark_start: float,
+    dark_end: float,
+    min_alt_deg: float,
+) -> TransitTable:
+    """
+    Rise/transit/set and the best window above min_alt_deg inside
+    [dark_start, dark_end] for many objects at once, from hour-angle math
+    instead of per-object root finding.
+    """
+    # transit closest to the reference instant
+    ha_ref = np.mod(lst_ref_hours - ra_hours + 12.0, 24.0) - 12.0
+    transit = -ha_ref / SIDEREAL_RATE
+
+    h_rise = semi_diurnal_arc(dec_deg, lat_deg, HORIZON_DEG)
+    h_rise = np.where(h_rise >= 12.0, np.nan, h_rise)  # circumpolar: no rise/set
+    rise = transit - h_rise / SIDEREAL_RATE
+    set_ = transit + h_rise / SIDEREAL_RATE
+
+    # the dark window can overlap the up-arc around this transit or a
+    # neighbouring one; keep whichever overlap is longest
+    half = semi_diurnal_arc(dec_deg, lat_deg, min_alt_deg)[:, np.newaxis] / SIDEREAL_RATE
+    day = 24.0 / SIDEREAL_RATE
+    tk = transit[:, np.newaxis] + np.array([-day, 0.0, day])[np.newaxis, :]
+    lo = np.maximum(tk - half, dark_start)
+    hi = np.minimum(tk + half, dark_end)
+    length = np.where(np.isnan(half), -np.inf, hi - lo)
+    k = np.argmax(length, axis=1)
+    rows = np.arange(len(k))
+    ok = length[rows, k] > 0
+
+    start = np.where(ok, lo[rows, k], np.nan)
+    end = np.where(ok, hi[rows, k], np.nan)
+    best = np.where(ok, np.clip(tk[rows, k], lo[rows, k], hi[rows, k]), np.nan)
+    best_alt, _ = hadec_to_altaz((best - tk[rows, k]) * SIDEREAL_RATE, dec_deg, lat_deg)
+    transit_alt = 90.0 - np.abs(lat_deg - dec_deg)
+
+    return TransitTable(
+        transit=transit,
+        transit_alt_deg=transit_alt,
+        rise=rise,
+        set=set_,
+        window_start=start,
+        window_end=end,
+        best=best,
+        best_alt_deg=best_alt,
+    )
+
+
+def sky_series(
+    latitude: float,
+    longitude: float,
+    t,
+    fixed: Optional[Star] = None,
+) -> SkySeries:
+    """
+    Same bodies as sky_snapshot(), but `t` is a Skyfield Time ARRAY and every
+    solar-system body is evaluated across the whole array in one call.
+
+    Skyfield can't broadcast an array Star against an array Time, so the fixed
+    targets are moved to RA/Dec of date once (middle of the range) and then
+    swept across the times with hour-angle math. Over a night the drift is
+    far below the precision we display.
+    """
+    eph = get_ephemeris()
+    topo = wgs84.latlon(latitude, longitude)
+    observer = eph.earth + topo
+    obs_at = observer.at(t)
+
+    sun_app = obs_at.observe(eph.sun).apparent()
+    sun_alt, _, _ = sun_app.altaz()
+    series = SkySeries(sun_alt_deg=sun_alt.degrees)
+
+    for name, body in eph.planets.items():
+        app = obs_at.observe(body).apparent()
+        alt, az, _ = app.altaz()
+        series.planets.append(
+            BodySeries(
+                name=name,
+                alt_deg=alt.degrees,
+                az_deg=az.degrees,
+                elong_deg=app.separation_from(sun_app).degrees,
+            )
+        )
+
+    moon_alt, moon_az, _ = obs_at.observe(eph.moon).apparent().altaz()
+    series.moon = BodySeries(name="Moon", alt_deg=moon_alt.degrees, az_deg=moon_az.degrees)
+
+    if fixed is not None:
+        t_mid = t[len(t.tt) // 2]
+        ra, dec = radec_of_date(fixed.ra.hours, fixed.dec.degrees, t_mid)
+        lst = topo.lst_hours_at(t)  # (n_times,)
+        ha = lst[np.newaxis, :] - ra[:, np.newaxis]
+        alt, az = hadec_to_altaz(ha, dec[:, np.newaxis], latitude)
+        series.fixed_alt_deg = alt
+        series.fixed_az_deg = az
+
+    return series
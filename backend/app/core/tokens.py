@@ -0,0 +1,190 @@
+# app/core/tokens.py
+"""
+Refresh-token rotation and access-token revocation.
+
+Login hands out a short-lived access token plus a refresh token. Each refresh
+swaps the refresh token for a new one in the same family (one family = one
+login), so the password KDF only runs at login. Presenting a refresh token
+that was already swapped means somebody else has a copy: the whole family
+is revoked. Access tokens carry their family id, and revoking a family puts
+it on the deny list get_current_user checks.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_EXPIRE_DAYS,
+    TOKEN_REVOCATION_SYNC_SECONDS,
+)
+from app.core.security import (
+    create_access_token,
+    create_refresh_token,
+    decode_access_token,
+    decode_refresh_token,
+    new_token_id,
+)
+from app.core.singleflight import SingleFlight
+from app.db.database import AsyncReadSessionLocal, utcnow
+from app.models.auth_token import RefreshToken, RevokedToken
+from app.schemas.user import Token
+
+logger = logging.getLogger(__name__)
+
+# another worker's rows can carry a revoked_at a little older than our last
+# sync (slow commit, clock skew), so each sync re-reads this far back
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def _naive_utc(dt: datetime) -> datetime:
+    # the DB stores naive UTC; Postgres hands timestamptz back aware
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class RevocationList:
+    """
+    In-memory mirror of revoked_tokens (token or family id -> expiry), so the
+    per-request check is a dict lookup. New rows are pulled from the DB at
+    most every `sync_seconds`: a revocation takes effect at once on the worker
+    that made it and within that window on the others. Expired entries are
+    dropped, so it only ever holds revocations of still-valid tokens.
+    """
+
+    def __init__(self, sync_seconds: float):
+        self.sync_seconds = sync_seconds
+        self._revoked: Dict[str, datetime] = {}
+        self._synced_at: Optional[datetime] = None
+        self._next_sync = 0.0
+        self._flight = SingleFlight()
+
+    async def is_revoked(self, *token_ids: Optional[str]) -> bool:
+        if time.monotonic() >= self._next_sync:
+            await self._flight.do("sync", self._sync)
+        return any(t in self._revoked for t in token_ids if t)
+
+    def add(self, token_id: str, expires_at: datetime) -> None:
+        self._revoked[token_id] = _naive_utc(expires_at)
+
+    def clear(self) -> None:
+        self._revoked.clear()
+        self._synced_at = None
+        self._next_sync = 0.0
+
+    async def _sync(self) -> None:
+        now = utcnow()
+        stmt = select(RevokedToken.token_id, RevokedToken.expires_at).where(RevokedToken.expires_at > now)
+        if self._synced_at is not None:
+            stmt = stmt.where(RevokedToken.revoked_at >= self._synced_at - SYNC_OVERLAP)
+        async with AsyncReadSessionLocal() as db:
+            rows = (await db.execute(stmt)).all()
+        for token_id, expires_at in rows:
+            self.add(token_id, expires_at)
+        self._revoked = {k: v for k, v in self._revoked.items() if v > now}
+        self._synced_at = now
+        self._next_sync = time.monotonic() + self.sync_seconds
+
+
+revoked_tokens = RevocationList(TOKEN_REVOCATION_SYNC_SECONDS)
+
+
+async def issue_tokens(db: AsyncSession, user_id: int, family: Optional[str] = None) -> Token:
+    """Access + refresh token pair. A new family unless continuing one (rotation)."""
+    now = utcnow()
+    family = family or new_token_id()
+    jti = new_token_id()
+    expires_at = now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    db.add(RefreshToken(jti=jti, family=family, user_id=user_id, expires_at=expires_at, created_at=now))
+    await db.commit()
+
+    access_token = create_access_token(
+        data={"sub": str(user_id), "fam": family},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+    return Token(
+        access_token=access_token,
+        refresh_token=create_refresh_token(user_id, jti, family, expires_at.replace(tzinfo=timezone.utc)),
+        expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    )
+
+
+async def rotate_refresh_token(db: AsyncSession, refresh_token: str) -> Optional[Token]:
+    """New token pair for a valid, unused refresh token; None otherwise."""
+    claims = decode_refresh_token(refresh_token)
+    if claims is None:
+        return None
+
+    now = utcnow()
+    # conditional update: of two requests racing with the same token, one wins
+    result = await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.jti == claims["jti"],
+            RefreshToken.rotated_at.is_(None),
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > now,
+        )
+        .values(rotated_at=now)
+    )
+    if result.rowcount != 1:
+        row = await db.get(RefreshToken, claims["jti"])
+        if row is not None and row.rotated_at is not None and row.revoked_at is None:
+            logger.warning("Refresh token reused, revoking its family", extra={"user_id": row.user_id})
+            await revoke_family(db, row.family)
+        else:
+            await db.rollback()
+        return None
+
+    return await issue_tokens(db, int(claims["sub"]), family=claims["fam"])
+
+
+async def _deny(db: AsyncSession, token_id: str, expires_at: datetime, now: datetime) -> None:
+    await db.merge(RevokedToken(token_id=token_id, expires_at=expires_at, revoked_at=now))
+    # housekeeping while we're writing anyway; both tables only matter until expiry
+    await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+    await db.execute(delete(RefreshToken).where(RefreshToken.expires_at <= now))
+
+
+async def revoke_family(db: AsyncSession, family: str) -> None:
+    """End a login: its refresh tokens and every access token issued under it."""
+    now = utcnow()
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family == family, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+    # no access token from this family outlives this
+    expires_at = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    await _deny(db, family, expires_at, now)
+    await db.commit()
+    revoked_tokens.add(family, expires_at)
+
+
+async def revoke_tokens(db: AsyncSession, access_token: Optional[str], refresh_token: Optional[str]) -> None:
+    """Logout: revoke whatever the client presented. Invalid or expired tokens are ignored."""
+    families = set()
+    access = decode_access_token(access_token) if access_token else None
+    if access is not None:
+        if access.get("fam"):
+            families.add(access["fam"])
+        elif access.get("jti") and access.get("exp"):
+            # issued before refresh tokens existed: deny just this token
+            now = utcnow()
+            expires_at = _naive_utc(datetime.fromtimestamp(access["exp"], timezone.utc))
+            await _deny(db, access["jti"], expires_at, now)
+            await db.commit()
+            revoked_tokens.add(access["jti"], expires_at)
+    refresh = decode_refresh_token(refresh_token) if refresh_token else None
+    if refresh is not None:
+        families.add(refresh["fam"])
+
+    for family in families:
+        await revoke_family(db, family)
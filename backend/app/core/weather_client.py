@@ -1,9 +1,45 @@
 from __future__ import annotations
-from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import httpx
 
+from app.core.cache import TTLCache
+from app.core.config import (
+    WEATHER_BATCH_CONCURRENCY,
+    WEATHER_CACHE_DB,
+    WEATHER_CACHE_SIZE,
+    WEATHER_GRID_DEG,
+    WEATHER_MODEL_UPDATE_HOURS,
+)
+from app.core.http_client import http_get
+from app.core.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+HOURLY_FIELDS = [
+    "temperature_2m",
+    "cloud_cover",
+    "wind_speed_10m",
+    "wind_direction_10m",
+    "is_day",
+    "weather_code",
+]
+
+# new model runs show up on Open-Meteo a little after the run time
+MODEL_AVAILABILITY_LAG = timedelta(minutes=15)
+MIN_TTL_SECONDS = 300
+# Open-Meteo accepts comma-separated coordinate lists; keep URLs reasonable
+MAX_COORDS_PER_REQUEST = 50
+PAST_DAY_TTL_SECONDS = 24 * 3600  # past hours are analysis data, they don't move
+
 
 class WeatherError(Exception):
     pass
@@ -14,45 +50,234 @@ def _as_utc_aware(dt: datetime) -> datetime:
         return dt.replace(tzinfo=timezone.utc)
     return dt.astimezone(timezone.utc)
 
-async def get_weather_for_time(
-    latitude: float,
-    longitude: float,
-    when: datetime,
-) -> Dict[str, Any]:
+
+ForecastKey = Tuple[float, float, str]
+
+
+def snap_to_grid(latitude: float, longitude: float) -> Tuple[float, float]:
+    # centre of the WEATHER_GRID_DEG cell; finer than the weather models resolve
+    g = WEATHER_GRID_DEG
+    return round(round(latitude / g) * g, 4), round(round(longitude / g) * g, 4)
+
+
+def forecast_key(latitude: float, longitude: float, day: date) -> ForecastKey:
+    lat, lon = snap_to_grid(latitude, longitude)
+    return lat, lon, day.isoformat()
+
+
+def forecast_ttl(day: date, now: Optional[datetime] = None) -> float:
+    """Seconds until the next model update is expected to be available."""
+    now = now or datetime.now(timezone.utc)
+    if day < now.date():
+        return PAST_DAY_TTL_SECONDS
+
+    step = timedelta(hours=WEATHER_MODEL_UPDATE_HOURS)
+    midnight = datetime.combine(now.date(), datetime.min.time(), tzinfo=timezone.utc)
+    runs = (now - midnight - MODEL_AVAILABILITY_LAG) // step + 1
+    next_update = midnight + runs * step + MODEL_AVAILABILITY_LAG
+    return max((next_update - now).total_seconds(), MIN_TTL_SECONDS)
+
+
+class ForecastCache:
     """
-    Get forecast near the given datetime for the given location using Open-Meteo.
-    Returns the hour CLOSEST to `when` (in UTC).
+    Whole-day hourly forecasts keyed by (grid cell, UTC date): an in-memory
+    LRU, optionally backed by a small SQLite file so restarts and other
+    workers on the box start warm.
     """
-    when_utc = _as_utc_aware(when)
-    date_str = when_utc.date().isoformat()
 
-    url = "https://api.open-meteo.com/v1/forecast"
+    def __init__(self, maxsize: int, db_path: Optional[str] = None):
+        self._memory = TTLCache(maxsize=maxsize)
+        self._db_path = db_path or None
+        self._db_lock = threading.Lock()
+        if self._db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS forecast_cache ("
+                    " key TEXT PRIMARY KEY, expires_at REAL NOT NULL, hourly TEXT NOT NULL)"
+                )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._db_path, timeout=5.0)
+
+    @staticmethod
+    def _db_key(key: ForecastKey) -> str:
+        return "{:.4f},{:.4f},{}".format(*key)
+
+    def _disk_get(self, key: ForecastKey) -> Optional[Tuple[Dict[str, Any], float]]:
+        with self._db_lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT expires_at, hourly FROM forecast_cache WHERE key = ?",
+                (self._db_key(key),),
+            ).fetchone()
+        if row is None or row[0] <= time.time():
+            return None
+        return json.loads(row[1]), row[0] - time.time()
+
+    def _disk_set(self, key: ForecastKey, hourly: Dict[str, Any], ttl: float) -> None:
+        with self._db_lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO forecast_cache (key, expires_at, hourly) VALUES (?, ?, ?)",
+                (self._db_key(key), time.time() + ttl, json.dumps(hourly)),
+            )
+            conn.execute("DELETE FROM forecast_cache WHERE expires_at <= ?", (time.time(),))
+
+    async def get(self, key: ForecastKey) -> Optional[Dict[str, Any]]:
+        hourly = self._memory.get(key)
+        if hourly is not None or not self._db_path:
+            return hourly
+        try:
+            found = await asyncio.to_thread(self._disk_get, key)
+        except sqlite3.Error:
+            logger.exception("Forecast disk cache read failed")
+            return None
+        if found is None:
+            return None
+        hourly, ttl = found
+        self._memory.set(key, hourly, ttl=ttl)
+        return hourly
+
+    async def set(self, key: ForecastKey, hourly: Dict[str, Any], ttl: float) -> None:
+        self._memory.set(key, hourly, ttl=ttl)
+        if self._db_path:
+            try:
+                await asyncio.to_thread(self._disk_set, key, hourly, ttl)
+            except sqlite3.Error:
+                logger.exception("Forecast disk cache write failed")
+
+    def clear(self) -> None:
+        self._memory.clear()
+
+
+forecast_cache = ForecastCache(WEATHER_CACHE_SIZE, WEATHER_CACHE_DB)
+# concurrent misses for the same (cell, day) share one upstream request
+_forecast_flight = SingleFlight()
+
+
+async def _fetch_hourly_multi(
+    cells: List[Tuple[float, float]],
+    day: date,
+) -> List[Dict[str, Any]]:
+    """One upstream request for several coordinates on the same day."""
+    date_str = day.isoformat()
     params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "hourly": ",".join(
-            [
-                "temperature_2m",
-                "cloud_cover",
-                "wind_speed_10m",
-                "wind_direction_10m",
-                "is_day",
-                "weather_code",  
-            ]
-        ),
+        "latitude": ",".join(str(lat) for lat, _ in cells),
+        "longitude": ",".join(str(lon) for _, lon in cells),
+        "hourly": ",".join(HOURLY_FIELDS),
         "start_date": date_str,
         "end_date": date_str,
         "timezone": "UTC",  # times aligned with `when_utc`
     }
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.get(url, params=params)
+    try:
+        resp = await http_get(FORECAST_URL, params=params)
+    except httpx.HTTPError as exc:
+        raise WeatherError(f"Weather API unreachable: {exc}")
 
     if resp.status_code != 200:
         raise WeatherError(f"Weather API error: {resp.status_code} {resp.text}")
 
     data = resp.json()
-    hourly = data.get("hourly") or {}
+    items = data if isinstance(data, list) else [data]  # single coordinate -> object
+    if len(items) != len(cells):
+        raise WeatherError("Weather API returned an unexpected number of locations")
+
+    out = []
+    for item in items:
+        hourly = item.get("hourly") or {}
+        if not hourly.get("time"):
+            raise WeatherError("No hourly data returned")
+        out.append(hourly)
+    return out
+
+
+async def _fetch_hourly(latitude: float, longitude: float, day: date) -> Dict[str, Any]:
+    return (await _fetch_hourly_multi([(latitude, longitude)], day))[0]
+
+
+async def get_hourly_forecasts(
+    points: Iterable[Tuple[float, float, date]],
+) -> Dict[ForecastKey, Union[Dict[str, Any], WeatherError]]:
+    """
+    Hourly arrays for many (lat, lon, UTC day) points. Points are collapsed to
+    forecast cells, cache hits are served locally, and the misses for each
+    day go out as multi-coordinate requests, run concurrently but at most
+    WEATHER_BATCH_CONCURRENCY at a time. Every missed cell goes through the
+    same single-flight key as get_hourly_forecast, so cells another request
+    is already fetching are waited for rather than fetched again. A failed
+    request only fails its own cells: their value is the WeatherError.
+    """
+    results: Dict[ForecastKey, Union[Dict[str, Any], WeatherError]] = {}
+    missing: Dict[str, List[ForecastKey]] = {}
+    seen = set()
+
+    for lat, lon, day in points:
+        key = forecast_key(lat, lon, day)
+        if key in seen:
+            continue
+        seen.add(key)
+        hourly = await forecast_cache.get(key)
+        if hourly is not None:
+            results[key] = hourly
+        else:
+            missing.setdefault(key[2], []).append(key)
+
+    slots = asyncio.Semaphore(WEATHER_BATCH_CONCURRENCY)
+
+    async def fetch(keys: List[ForecastKey]) -> Dict[ForecastKey, Dict[str, Any]]:
+        day = date.fromisoformat(keys[0][2])
+        async with slots:
+            hourlies = await _fetch_hourly_multi([(k[0], k[1]) for k in keys], day)
+        ttl = forecast_ttl(day)
+        for key, hourly in zip(keys, hourlies):
+            await forecast_cache.set(key, hourly, ttl)
+        return dict(zip(keys, hourlies))
+
+    async def share(key: ForecastKey, batch: asyncio.Future) -> Dict[str, Any]:
+        return (await batch)[key]
+
+    batch_of: Dict[ForecastKey, asyncio.Future] = {}
+    for keys in missing.values():
+        # cells another request is already fetching are joined, not re-requested
+        fresh = [k for k in keys if k not in _forecast_flight]
+        for i in range(0, len(fresh), MAX_COORDS_PER_REQUEST):
+            chunk = fresh[i:i + MAX_COORDS_PER_REQUEST]
+            batch = asyncio.ensure_future(fetch(chunk))
+            batch_of.update(dict.fromkeys(chunk, batch))
+
+    # registered before the first await so concurrent callers find them
+    flights = {
+        key: _forecast_flight.join(key, lambda key=key: share(key, batch_of[key]))
+        for keys in missing.values()
+        for key in keys
+    }
+    for key, flight in flights.items():
+        try:
+            results[key] = await asyncio.shield(flight)
+        except WeatherError as exc:
+            results[key] = exc
+    return results
+
+
+async def get_hourly_forecast(latitude: float, longitude: float, day: date) -> Dict[str, Any]:
+    """
+    Full hourly arrays for one UTC day at the grid cell containing the point.
+    Served from the forecast cache when possible.
+    """
+    key = forecast_key(latitude, longitude, day)
+    hourly = await forecast_cache.get(key)
+    if hourly is not None:
+        return hourly
+
+    async def fetch() -> Dict[str, Any]:
+        lat, lon, _ = key
+        hourly = await _fetch_hourly(lat, lon, day)
+        await forecast_cache.set(key, hourly, forecast_ttl(day))
+        return hourly
+
+    return await _forecast_flight.do(key, fetch)
+
+
+def pick_hour(hourly: Dict[str, Any], when_utc: datetime) -> Dict[str, Any]:
     times = hourly.get("time") or []
     if not times:
         raise WeatherError("No hourly data returned")
@@ -62,7 +287,7 @@ async def get_weather_for_time(
     best_diff: Optional[float] = None
 
     for i, t in enumerate(times):
-        # Open-Meteo returns ISO8601; in timezone=UTC UTC wall times 
+        # Open-Meteo returns ISO8601; in timezone=UTC UTC wall times
         t_dt = datetime.fromisoformat(t)
         if t_dt.tzinfo is None:
             t_dt = t_dt.replace(tzinfo=timezone.utc)
@@ -88,3 +313,17 @@ async def get_weather_for_time(
         "is_day": bool(is_day_val) if is_day_val is not None else None,
         "weather_code": int(weather_code) if weather_code is not None else None,  # ✅ NEW
     }
+
+
+async def get_weather_for_time(
+    latitude: float,
+    longitude: float,
+    when: datetime,
+) -> Dict[str, Any]:
+    """
+    Get forecast near the given datetime for the given location using Open-Meteo.
+    Returns the hour CLOSEST to `when` (in UTC).
+    """
+    when_utc = _as_utc_aware(when)
+    hourly = await get_hourly_forecast(latitude, longitude, when_utc.date())
+    return pick_hour(hourly, when_utc)
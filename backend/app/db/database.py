@@ -1,41 +1,158 @@
 import os
-import sqlite3
+from datetime import datetime, timezone
 from sqlalchemy import create_engine, event
-from sqlalchemy.engine import Engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # SQLite for local dev; maybe swap to Postgres via env var
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./astroplanner.db")
+# read-only traffic (lists, lookups, auth); a replica on Postgres, same file on SQLite
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", DATABASE_URL)
 
-# SQLite needs this extra arg; Postgres will ignore it
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+# connection pool, per engine and per process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; stay under server/proxy idle timeouts
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+# SQLite tuning: WAL journal so readers never wait on the writer, relaxed fsync,
+# bigger page cache and mmap. SQLITE_TUNED=0 keeps SQLite's stock settings.
+SQLITE_TUNED = os.getenv("SQLITE_TUNED", "1") == "1"
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
 
-@event.listens_for(Engine, "connect")
-def _set_sqlite_pragma(dbapi_connection, connection_record):
-    if isinstance(dbapi_connection, sqlite3.Connection):
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    return _is_sqlite(url) and make_url(url).database in (None, "", ":memory:")
+
+
+def _async_url(url: str) -> str:
+    # same database through an asyncio driver (aiosqlite / asyncpg)
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:") or url.startswith("postgres:"):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_url(DATABASE_URL))
+ASYNC_DATABASE_READ_URL = os.getenv("ASYNC_DATABASE_READ_URL", _async_url(DATABASE_READ_URL))
+
+
+def _sqlite_pragmas(read_only: bool) -> list[str]:
+    pragmas = ["PRAGMA foreign_keys=ON"]
+    if SQLITE_TUNED:
+        pragmas += [
+            "PRAGMA journal_mode=WAL",
+            # with WAL, NORMAL only risks the last commits on power loss, never corruption
+            "PRAGMA synchronous=NORMAL",
+            f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+            f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}",  # negative = KiB, not pages
+            f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def _install_sqlite_pragmas(sync_engine, read_only: bool = False) -> None:
+    pragmas = _sqlite_pragmas(read_only)
+
+    # works for sqlite3 connections and aiosqlite's adapted ones
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragma(dbapi_connection, connection_record):
         cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON;")
+        for pragma in pragmas:
+            cursor.execute(pragma)
         cursor.close()
 
-SessionLocal = sessionmaker(
-    autocommit=False,
+
+def _pool_args(url: str) -> dict:
+    if _is_sqlite_memory(url):
+        return {}  # single shared connection, nothing to size
+    args = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+    if not _is_sqlite(url):
+        # server connections get dropped by idle timeouts and failovers
+        args["pool_recycle"] = DB_POOL_RECYCLE
+        args["pool_pre_ping"] = DB_POOL_PRE_PING
+    return args
+
+
+def _make_engine(url: str):
+    # SQLite needs this extra arg; Postgres will ignore it
+    connect_args = {"check_same_thread": False} if _is_sqlite(url) else {}
+    eng = create_engine(url, connect_args=connect_args, **_pool_args(url))
+    if _is_sqlite(url):
+        _install_sqlite_pragmas(eng)
+    return eng
+
+
+def _make_async_engine(url: str, read_only: bool = False):
+    eng = create_async_engine(url, **_pool_args(url))
+    if _is_sqlite(url):
+        _install_sqlite_pragmas(eng.sync_engine, read_only)
+    return eng
+
+
+def _split_reads(url: str, read_url: str) -> bool:
+    # an in-memory SQLite database exists per connection; it can't be shared
+    if _is_sqlite_memory(url):
+        return False
+    return read_url != url or (_is_sqlite(url) and SQLITE_TUNED)
+
+
+# sync engine: migrations only, the app itself goes through the async engines
+engine = _make_engine(DATABASE_URL)
+async_engine = _make_async_engine(ASYNC_DATABASE_URL)
+
+# separate pools for reads, so a burst of writers waiting on the SQLite write
+# lock (or a busy primary) can't starve the read endpoints of connections
+if _split_reads(DATABASE_URL, DATABASE_READ_URL):
+    async_read_engine = _make_async_engine(ASYNC_DATABASE_READ_URL, read_only=True)
+else:
+    async_read_engine = async_engine
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    autoflush=False,
+    expire_on_commit=False,  # attributes stay readable after commit without a reload
+)
+
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine,
     autoflush=False,
-    bind=engine,
+    expire_on_commit=False,
 )
 
 Base = declarative_base()
 
+
+def utcnow() -> datetime:
+    # the DB stores naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 # FastAPI dependency for DB session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Handlers that only read: goes to the read pool / replica
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
         yield db
-    finally:
-        db.close()
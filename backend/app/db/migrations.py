@@ -0,0 +1,37 @@
+# app/db/migrations.py
+"""
+Schema migrations (Alembic, see backend/migrations). Run at startup unless
+DB_AUTO_MIGRATE=0; with several workers, run `alembic upgrade head` once
+before starting them instead.
+"""
+import logging
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from app.db.database import engine
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "..", "..", "alembic.ini")
+# the schema create_all() used to build; databases from before migrations get stamped with it
+BASELINE_REVISION = "0001"
+
+
+def alembic_config() -> Config:
+    cfg = Config(os.path.abspath(ALEMBIC_INI))
+    cfg.attributes["configure_logger"] = False
+    return cfg
+
+
+def run_migrations() -> None:
+    cfg = alembic_config()
+    with engine.begin() as connection:
+        cfg.attributes["connection"] = connection
+        tables = set(inspect(connection).get_table_names())
+        if "users" in tables and "alembic_version" not in tables:
+            logger.info("Existing database without migration history, stamping %s", BASELINE_REVISION)
+            command.stamp(cfg, BASELINE_REVISION)
+        command.upgrade(cfg, "head")
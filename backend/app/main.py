@@ -1,12 +1,35 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import targets
-from app.db.database import Base, engine
-from app.models import user, location, observation_session, observation_log  
+from app.routers.targets import CACHE_HEADER, visible_cache
+from app.core.astro_pool import shutdown_pool, start_pool
+from app.core.config import DB_AUTO_MIGRATE, EPHEMERIS_WARMUP
+from app.core.http_client import close_http_client, start_http_client
+from app.core.pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER
+from app.db.migrations import run_migrations
+from app.models import user, location, observation_session, observation_log, auth_token  
 from app.routers import auth, locations, sessions, observation_logs, weather, geocode
 from app.routers import planner
 
-app = FastAPI(title="AstroPlanner API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_AUTO_MIGRATE:
+        run_migrations()
+    if EPHEMERIS_WARMUP:
+        # don't block startup on kernel I/O; the pool's children load it in the background
+        start_pool()
+    await start_http_client()
+    try:
+        yield
+    finally:
+        await close_http_client()
+        shutdown_pool()
+
+
+app = FastAPI(title="AstroPlanner API", lifespan=lifespan)
 
 # frontend dev origin
 origins = [
@@ -20,14 +43,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, CACHE_HEADER],  # list pagination, /targets/visible
 )
 
 
-@app.on_event("startup")
-def on_startup():
-    Base.metadata.create_all(bind=engine)
-
-
 app.include_router(auth.router)
 app.include_router(locations.router)
 app.include_router(sessions.router)
@@ -39,4 +58,4 @@ app.include_router(planner.router)
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    return {"status": "ok", "visible_cache": visible_cache.stats()}
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+
+from app.db.database import Base
+
+
+class RefreshToken(Base):
+    """One issued refresh token. Rotation chains tokens into a family (one login)."""
+    __tablename__ = "refresh_tokens"
+
+    jti = Column(String(32), primary_key=True)
+    family = Column(String(32), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    rotated_at = Column(DateTime(timezone=True), nullable=True)  # exchanged for a new one
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class RevokedToken(Base):
+    """
+    Deny list for access tokens that haven't expired yet: a token's jti, or a
+    whole login family. Rows are useless (and purged) once expires_at passes.
+    """
+    __tablename__ = "revoked_tokens"
+
+    token_id = Column(String(32), primary_key=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), nullable=False, index=True)
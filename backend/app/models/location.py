@@ -1,11 +1,12 @@
-from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 
-from app.db.database import Base
+from app.db.database import Base, utcnow
 
 
 class Location(Base):
     __tablename__ = "locations"
+    __table_args__ = (Index("ix_locations_owner_id", "owner_id", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -16,6 +17,8 @@ class Location(Base):
 
     notes = Column(Text, nullable=True)
 
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+
     owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     owner = relationship("User", back_populates="locations")
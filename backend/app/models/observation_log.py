@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index, func
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 
 from app.db.database import Base
@@ -6,6 +7,7 @@ from app.db.database import Base
 
 class ObservationLog(Base):
     __tablename__ = "observation_logs"
+    __table_args__ = (Index("ix_observation_logs_session_created", "session_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -15,6 +17,16 @@ class ObservationLog(Base):
     rating = Column(Integer, nullable=True)       # 1–5, etc.
 
     session_id = Column(Integer, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # SQLite fills this from CURRENT_TIMESTAMP ("YYYY-MM-DD HH:MM:SS"); bind values
+    # in that same text form so keyset comparisons against it line up
+    created_at = Column(
+        DateTime(timezone=True).with_variant(
+            sqlite.DATETIME(
+                storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+            ),
+            "sqlite",
+        ),
+        server_default=func.now(),
+    )
 
     session = relationship("ObservationSession", back_populates="logs")
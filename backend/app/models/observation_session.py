@@ -1,11 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 
-from app.db.database import Base
+from app.db.database import Base, utcnow
 
 
 class ObservationSession(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        Index("ix_sessions_owner_start", "owner_id", "scheduled_start"),
+        Index("ix_sessions_location_status_start", "location_id", "status", "scheduled_start"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -18,6 +22,8 @@ class ObservationSession(Base):
     location_id = Column(Integer, ForeignKey("locations.id", ondelete="CASCADE"), nullable=False)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # bumped on every change; drives calendar ETag / Last-Modified
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
 
     owner = relationship("User", back_populates="sessions")
     location = relationship("Location", back_populates="sessions")
@@ -11,6 +11,8 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # signed into calendar feed URLs; bumping it revokes the old URL
+    feed_token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     locations = relationship("Location", back_populates="owner", cascade="all, delete-orphan")
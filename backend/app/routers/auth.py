@@ -1,22 +1,23 @@
-from datetime import timedelta
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core import deps
-from app.core.config import ACCESS_TOKEN_EXPIRE_MINUTES
-from app.core.security import get_password_hash, create_access_token
-from app.db.database import get_db
+from app.core import tokens
+from app.core.security import hash_password_async
+from app.db.database import get_async_db
 from app.models.user import User
-from app.schemas.user import UserCreate, UserRead, Token
+from app.schemas.user import LogoutRequest, RefreshRequest, UserCreate, UserRead, Token
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/register", response_model=UserRead, status_code=status.HTTP_201_CREATED)
-def register_user(user_in: UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == user_in.email).first()
+async def register_user(user_in: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.scalar(select(User).where(User.email == user_in.email))
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -25,26 +26,29 @@ def register_user(user_in: UserCreate, db: Session = Depends(get_db)):
 
     user = User(
         email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await hash_password_async(user_in.password),
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    deps.forget_user(user.id)  # in case a miss for this id was cached
     return user
 
 
 @router.post("/login", response_model=Token)
-def login_for_access_token(
-    response: Response,
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Accepts form data:
     - username (we treat this as email)
     - password
+
+    Returns an access token and a refresh token; use /auth/refresh to get
+    new ones instead of logging in again.
     """
-    user = deps.authenticate_user(db, email=form_data.username, password=form_data.password)
+    user = await deps.authenticate_user(db, email=form_data.username, password=form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -52,20 +56,32 @@ def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user.id)},   
-        expires_delta=access_token_expires,
-)
+    return await tokens.issue_tokens(db, user.id)
 
 
-    return Token(access_token=access_token, token_type="bearer")
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(body: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """Swap a refresh token for a new pair. Each refresh token works once."""
+    pair = await tokens.rotate_refresh_token(db, body.refresh_token)
+    if pair is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return pair
+
 
 @router.post("/logout")
-def logout(response: Response):
-    response.delete_cookie("access_token")
+async def logout(
+    body: Optional[LogoutRequest] = None,
+    access_token: Optional[str] = Depends(deps.optional_oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Revokes the login behind the bearer token and/or the refresh token sent in the body."""
+    await tokens.revoke_tokens(db, access_token, body.refresh_token if body else None)
     return {"ok": True}
 
 @router.get("/me", response_model=UserRead)
-def read_current_user(current_user: User = Depends(deps.get_current_user)):
+async def read_current_user(current_user: User = Depends(deps.get_current_user_record)):
     return current_user
@@ -1,10 +1,11 @@
 # app/routers/geocode.py
+from typing import List
+
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 
-from app.core.deps import get_current_user
-from app.core.geocoding_client import geocode_place, GeocodingError
+from app.core.deps import Principal, get_current_user
+from app.core.geocoding_client import geocode_place, suggest_places, GeocodingError
 from app.schemas.geocode import GeocodeResult
-from app.models.user import User
 
 router = APIRouter(
     prefix="/geocode",
@@ -15,7 +16,7 @@ router = APIRouter(
 @router.get("/", response_model=GeocodeResult)
 async def geocode(
     q: str = Query(..., description="Place name, city, or address"),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     try:
         result = await geocode_place(q)
@@ -25,3 +26,20 @@ async def geocode(
             detail=str(exc),
         )
     return GeocodeResult(**result)
+
+
+@router.get("/suggest", response_model=List[GeocodeResult])
+async def suggest(
+    q: str = Query(..., min_length=2, description="What the user has typed so far"),
+    limit: int = Query(default=10, ge=1, le=25),
+    current_user: Principal = Depends(get_current_user),
+):
+    # local prefix index; upstream only if the local store is broken
+    try:
+        places = await suggest_places(q, limit)
+    except GeocodingError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc),
+        )
+    return [GeocodeResult(**p) for p in places]
@@ -1,12 +1,14 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.observation_session import ObservationSession
-from app.core.deps import get_current_user
-from app.db.database import get_db
+from app.core.calendar_feed import calendar_feeds
+from app.core.deps import Principal, get_current_user
+from app.core.pagination import MAX_PAGE_SIZE, paginate
+from app.db.database import get_async_db, get_async_read_db
 from app.models.location import Location
-from app.models.user import User
 from app.schemas.location import (
     LocationCreate,
     LocationUpdate,
@@ -16,11 +18,17 @@ from app.schemas.location import (
 router = APIRouter(prefix="/locations", tags=["locations"])
 
 
+async def _get_user_location(db: AsyncSession, location_id: int, user_id: int) -> Location | None:
+    return await db.scalar(
+        select(Location).where(Location.id == location_id, Location.owner_id == user_id)
+    )
+
+
 @router.post("/", response_model=LocationRead, status_code=status.HTTP_201_CREATED)
-def create_location(
+async def create_location(
     location_in: LocationCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
     location = Location(
         name=location_in.name,
@@ -34,81 +42,75 @@ def create_location(
         owner_id=current_user.id,
     )
     db.add(location)
-    db.commit()
-    db.refresh(location)
+    await db.commit()
+    await db.refresh(location)
     return location
 
 
 @router.get("/", response_model=List[LocationRead])
-def list_locations(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+async def list_locations(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = False,  # X-Total-Count costs an extra COUNT(*)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    locations = (
-        db.query(Location)
-        .filter(Location.owner_id == current_user.id)
-        .order_by(Location.id.desc())
-        .all()
+    # newest first, paged on id (see X-Next-Cursor)
+    return await paginate(
+        db,
+        select(Location).where(Location.owner_id == current_user.id),
+        (Location.id,),
+        response,
+        cursor=cursor,
+        limit=limit,
+        include_total=include_total,
     )
-    return locations
 
 
 @router.get("/{location_id}", response_model=LocationRead)
-def get_location(
+async def get_location(
     location_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    location = (
-        db.query(Location)
-        .filter(Location.id == location_id, Location.owner_id == current_user.id)
-        .first()
-    )
+    location = await _get_user_location(db, location_id, current_user.id)
     if not location:
         raise HTTPException(status_code=404, detail="Location not found")
     return location
 
 
 @router.put("/{location_id}", response_model=LocationRead)
-def update_location(
+async def update_location(
     location_id: int,
     location_in: LocationUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    location = (
-        db.query(Location)
-        .filter(Location.id == location_id, Location.owner_id == current_user.id)
-        .first()
-    )
+    location = await _get_user_location(db, location_id, current_user.id)
     if not location:
         raise HTTPException(status_code=404, detail="Location not found")
 
     for field, value in location_in.model_dump(exclude_unset=True).items():
         setattr(location, field, value)
 
-    db.commit()
-    db.refresh(location)
+    await db.commit()
+    await db.refresh(location)
+    calendar_feeds.invalidate_user(current_user.id)  # name/coords are in every event there
     return location
 
 
 @router.delete("/{location_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_location(
+async def delete_location(
     location_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    loc = (
-        db.query(Location)
-        .filter(
-            Location.id == location_id,
-            Location.owner_id == current_user.id,
-        )
-        .first()
-    )
+    loc = await _get_user_location(db, location_id, current_user.id)
     if not loc:
         raise HTTPException(status_code=404, detail="Location not found")
 
-    db.delete(loc)
-    db.commit()
+    await db.delete(loc)
+    await db.commit()
+    calendar_feeds.invalidate_user(current_user.id)  # its sessions went with it
     return None
@@ -1,13 +1,15 @@
-from typing import List
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.deps import get_current_user
-from app.db.database import get_db
+from app.core.deps import Principal, get_current_user
+from app.core.pagination import MAX_PAGE_SIZE, paginate
+from app.db.database import get_async_db, get_async_read_db
 from app.models.observation_log import ObservationLog
 from app.models.observation_session import ObservationSession
-from app.models.user import User
 from app.schemas.observation_log import (
     ObservationLogCreate,
     ObservationLogUpdate,
@@ -17,29 +19,47 @@ from app.schemas.observation_log import (
 router = APIRouter(prefix="/sessions/{session_id}/logs", tags=["observation_logs"])
 
 
-def _get_user_session(
-    db: Session,
+def _as_utc_naive(dt: datetime) -> datetime:
+    # created_at is stored as naive UTC
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def _get_user_session(
+    db: AsyncSession,
     session_id: int,
     user_id: int,
 ) -> ObservationSession | None:
-    return (
-        db.query(ObservationSession)
-        .filter(
+    return await db.scalar(
+        select(ObservationSession).where(
             ObservationSession.id == session_id,
             ObservationSession.owner_id == user_id,
         )
-        .first()
+    )
+
+
+async def _get_session_log(
+    db: AsyncSession,
+    session_id: int,
+    log_id: int,
+) -> ObservationLog | None:
+    return await db.scalar(
+        select(ObservationLog).where(
+            ObservationLog.id == log_id,
+            ObservationLog.session_id == session_id,
+        )
     )
 
 
 @router.post("/", response_model=ObservationLogRead, status_code=status.HTTP_201_CREATED)
-def create_log(
+async def create_log(
     session_id: int,
     log_in: ObservationLogCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    session = _get_user_session(db, session_id, current_user.id)
+    session = await _get_user_session(db, session_id, current_user.id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
@@ -51,83 +71,86 @@ def create_log(
         rating=log_in.rating,
     )
     db.add(log)
-    db.commit()
-    db.refresh(log)
+    await db.commit()
+    await db.refresh(log)
     return log
 
 
 @router.get("/", response_model=List[ObservationLogRead])
-def list_logs(
+async def list_logs(
     session_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    order: Literal["asc", "desc"] = "desc",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = False,  # X-Total-Count costs an extra COUNT(*)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    session = _get_user_session(db, session_id, current_user.id)
+    """Newest first by default, paged on (created_at, id) (see X-Next-Cursor)."""
+    session = await _get_user_session(db, session_id, current_user.id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    logs = (
-        db.query(ObservationLog)
-        .filter(ObservationLog.session_id == session.id)
-        .order_by(ObservationLog.created_at.desc())
-        .all()
+    q = select(ObservationLog).where(ObservationLog.session_id == session.id)
+    if created_from is not None:
+        q = q.where(ObservationLog.created_at >= _as_utc_naive(created_from))
+    if created_to is not None:
+        q = q.where(ObservationLog.created_at <= _as_utc_naive(created_to))
+
+    return await paginate(
+        db,
+        q,
+        (ObservationLog.created_at, ObservationLog.id),
+        response,
+        cursor=cursor,
+        limit=limit,
+        descending=order == "desc",
+        include_total=include_total,
     )
-    return logs
 
 
 @router.patch("/{log_id}", response_model=ObservationLogRead)
-def update_log(
+async def update_log(
     session_id: int,
     log_id: int,
     log_in: ObservationLogUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    session = _get_user_session(db, session_id, current_user.id)
+    session = await _get_user_session(db, session_id, current_user.id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    log = (
-        db.query(ObservationLog)
-        .filter(
-            ObservationLog.id == log_id,
-            ObservationLog.session_id == session.id,
-        )
-        .first()
-    )
+    log = await _get_session_log(db, session.id, log_id)
     if not log:
         raise HTTPException(status_code=404, detail="Log not found")
 
     for field, value in log_in.model_dump(exclude_unset=True).items():
         setattr(log, field, value)
 
-    db.commit()
-    db.refresh(log)
+    await db.commit()
+    await db.refresh(log)
     return log
 
 
 @router.delete("/{log_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_log(
+async def delete_log(
     session_id: int,
     log_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    session = _get_user_session(db, session_id, current_user.id)
+    session = await _get_user_session(db, session_id, current_user.id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    log = (
-        db.query(ObservationLog)
-        .filter(
-            ObservationLog.id == log_id,
-            ObservationLog.session_id == session.id,
-        )
-        .first()
-    )
+    log = await _get_session_log(db, session.id, log_id)
     if not log:
         raise HTTPException(status_code=404, detail="Log not found")
 
-    db.delete(log)
-    db.commit()
+    await db.delete(log)
+    await db.commit()
     return None
@@ -1,137 +1,657 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
-from typing import Optional
+import asyncio
+import hashlib
+import math
+import re
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Literal, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import Response
-from sqlalchemy.orm import Session as DbSession
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
 
-from app.core.deps import get_db
+from app.core.astro_pool import run_astro
+from app.core.cache import TTLCache
+from app.core.calendar_feed import calendar_feeds
+from app.core.config import (
+    ASTRO_POOL_WORKERS,
+    AUTH_USER_CACHE_SIZE,
+    AUTH_USER_CACHE_TTL_SECONDS,
+    CALENDAR_FEED_CACHE_SIZE,
+    CALENDAR_FEED_TTL_SECONDS,
+)
+from app.core.deps import Principal, get_current_user
+from app.core.ephemeris import get_ephemeris, get_timescale
+from app.core.ics import ICS_FOOTER, ICS_HEADER, render_vevent
+from app.core.night import night_window
+from app.core.planning import (
+    CATALOG,
+    DARKNESS_SUN_ALT,
+    DSO_MIN_ALT,
+    Site,
+    SiteSky,
+    catalog_window_scores,
+    night_for,
+    site_sky,
+    visibility_mask,
+    visibility_score,
+)
+from app.core.weather_client import WeatherError, forecast_key, get_hourly_forecasts
+from app.core.scheduler import block_values, schedule
+from app.core.security import create_feed_token, decode_feed_token
+from app.core.sky import sky_series
+from app.db.database import AsyncReadSessionLocal, get_async_db, get_async_read_db
 from app.models.observation_session import ObservationSession
 from app.models.location import Location
+from app.models.user import User
 
 
 router = APIRouter(prefix="/planner", tags=["planner"])
 
 
-def _ics_escape(s: str) -> str:
-    # Minimal escaping for ICS fields
-    return (
-        s.replace("\\", "\\\\")
-        .replace(";", "\\;")
-        .replace(",", "\\,")
-        .replace("\r\n", "\n")
-        .replace("\n", "\\n")
+# rows fetched per round trip, and VEVENTs per chunk written to the socket
+ICS_YIELD_PER = 500
+EVENTS_PER_CHUNK = 200
+
+# (user, export filters) -> (ETag, Last-Modified) last served by this process
+_export_versions = TTLCache(maxsize=CALENDAR_FEED_CACHE_SIZE, ttl=CALENDAR_FEED_TTL_SECONDS)
+
+
+async def _get_user_location(db: AsyncSession, location_id: int, user_id: int) -> Location:
+    loc = await db.scalar(
+        select(Location).where(Location.id == location_id, Location.owner_id == user_id)
     )
+    if not loc:
+        raise HTTPException(status_code=404, detail="Location not found")
+    return loc
 
 
-def _ics_dt_utc(dt: datetime) -> str:
-    # Format as UTC "YYYYMMDDTHHMMSSZ"
+def _utc_naive(dt: datetime) -> datetime:
+    # DB stores naive UTC
     if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
-    dt = dt.astimezone(timezone.utc)
-    return dt.strftime("%Y%m%dT%H%M%SZ")
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class CalendarFeedLink(BaseModel):
+    url: str
+
+
+def _filter_sessions(
+    stmt: Select,
+    owner_id: int,
+    location_id: Optional[int],
+    status: Optional[str],
+    start_from: Optional[datetime],
+    start_to: Optional[datetime],
+) -> Select:
+    stmt = stmt.where(ObservationSession.owner_id == owner_id)
+    if location_id is not None:
+        stmt = stmt.where(ObservationSession.location_id == location_id)
+    if status is not None:
+        stmt = stmt.where(ObservationSession.status == status)
+    if start_from is not None:
+        stmt = stmt.where(ObservationSession.scheduled_start >= _utc_naive(start_from))
+    if start_to is not None:
+        stmt = stmt.where(ObservationSession.scheduled_start <= _utc_naive(start_to))
+    return stmt
+
+
+async def _stream_ics(stmt: Select, dur: timedelta) -> AsyncIterator[str]:
+    yield ICS_HEADER
+    # own session: the request's dependency session may be closed before the body is sent
+    async with AsyncReadSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=ICS_YIELD_PER))
+        chunk: list[str] = []
+        async for s, loc in result:
+            chunk.append(render_vevent(s, loc, dur))
+            if len(chunk) >= EVENTS_PER_CHUNK:
+                yield "".join(chunk)
+                chunk = []
+        if chunk:
+            yield "".join(chunk)
+    yield ICS_FOOTER
+
+
+def _not_modified(
+    request: Request, etag: str, last_modified: Optional[datetime], trust_date: bool = True
+) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None and trust_date:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
 
 
 @router.get("/ics")
-def export_ics(
+async def export_ics(
+    request: Request,
     location_id: Optional[int] = Query(default=None),
     status: Optional[str] = Query(default="planned"),  # set None to export all
     start_from: Optional[datetime] = Query(default=None),
     start_to: Optional[datetime] = Query(default=None),
     duration_minutes: int = Query(default=90, ge=15, le=12 * 60),
-    db: DbSession = Depends(get_db),
-    # OPTIONAL auth:
-    # user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    q = db.query(ObservationSession)
+    """
+    Sessions as an iCalendar file, streamed straight from a DB cursor.
+    Sends ETag / Last-Modified and answers polling clients with 304 when
+    nothing in the export changed.
+    """
+    joined = select(ObservationSession, Location).join(
+        Location, Location.id == ObservationSession.location_id
+    )
+    stmt = _filter_sessions(joined, current_user.id, location_id, status, start_from, start_to)
 
-    if location_id is not None:
-        q = q.filter(ObservationSession.location_id == location_id)
+    # cheap fingerprint of what the export would contain
+    stats = (
+        await db.execute(
+            _filter_sessions(
+                select(
+                    func.count(ObservationSession.id),
+                    func.max(ObservationSession.id),
+                    func.max(ObservationSession.updated_at),
+                    func.max(Location.updated_at),
+                ).join(Location, Location.id == ObservationSession.location_id),
+                current_user.id,
+                location_id,
+                status,
+                start_from,
+                start_to,
+            )
+        )
+    ).one()
+    fingerprint = repr((location_id, status, start_from, start_to, duration_minutes, tuple(stats)))
+    etag = '"' + hashlib.sha256(fingerprint.encode()).hexdigest()[:32] + '"'
 
-    if status is not None:
-        q = q.filter(ObservationSession.status == status)
+    # deletions don't move max(updated_at), so it can't date the export: an
+    # ETag this process hasn't served yet is dated now (its If-Modified-Since
+    # isn't trusted), one it has keeps the date it was first served with
+    export_key = (current_user.id, location_id, status, start_from, start_to, duration_minutes)
+    seen = _export_versions.get(export_key)
+    trust_date = seen is not None and seen[0] == etag
+    last_modified = seen[1] if trust_date else datetime.now(timezone.utc)
+    _export_versions.set(export_key, (etag, last_modified))
 
-    if start_from is not None:
-        q = q.filter(ObservationSession.scheduled_start >= start_from)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+    }
+
+    if _not_modified(request, etag, last_modified, trust_date):
+        return Response(status_code=304, headers=headers)
+
+    filename = "astroplanner.ics"
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    return StreamingResponse(
+        _stream_ics(stmt.order_by(ObservationSession.scheduled_start.asc()), timedelta(minutes=duration_minutes)),
+        media_type="text/calendar; charset=utf-8",
+        headers=headers,
+    )
+
+
+# user id -> current feed_token_version; like the auth user check, a revoked
+# feed URL can keep working on other workers for up to the TTL
+_feed_versions = TTLCache(maxsize=AUTH_USER_CACHE_SIZE, ttl=AUTH_USER_CACHE_TTL_SECONDS)
+
+
+async def _feed_version(user_id: int) -> Optional[int]:
+    version = _feed_versions.get(user_id)
+    if version is None:
+        async with AsyncReadSessionLocal() as db:
+            version = await db.scalar(select(User.feed_token_version).where(User.id == user_id))
+        if version is not None:
+            _feed_versions.set(user_id, version)
+    return version
+
+
+def _feed_link(request: Request, user_id: int, version: int) -> CalendarFeedLink:
+    token = create_feed_token(user_id, version)
+    return CalendarFeedLink(url=str(request.url_for("calendar_feed", token=token)))
+
+
+@router.get("/feed", response_model=CalendarFeedLink)
+async def calendar_feed_link(
+    request: Request,
+    current_user: Principal = Depends(get_current_user),
+):
+    """Subscription URL for the user's calendar; the token in it is the only credential."""
+    version = await _feed_version(current_user.id)
+    if version is None:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    return _feed_link(request, current_user.id, version)
+
+
+@router.post("/feed/rotate", response_model=CalendarFeedLink)
+async def rotate_calendar_feed_link(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """New subscription URL; the old one stops working (a leaked link, say)."""
+    version = await db.scalar(
+        update(User)
+        .where(User.id == current_user.id)
+        .values(feed_token_version=User.feed_token_version + 1)
+        .returning(User.feed_token_version)
+    )
+    if version is None:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    await db.commit()
+    _feed_versions.set(current_user.id, version)
+    calendar_feeds.invalidate_user(current_user.id)
+    return _feed_link(request, current_user.id, version)
+
+
+@router.get("/feed/{token}.ics", name="calendar_feed")
+async def calendar_feed(token: str, request: Request):
+    """
+    All of one user's sessions, for calendar apps that poll. Served from the
+    rendered-feed cache; session writes re-render only the events they touch.
+    """
+    claims = decode_feed_token(token)
+    if claims is None:
+        raise HTTPException(status_code=404, detail="Feed not found")
+    user_id, version = claims
+    if await _feed_version(user_id) != version:
+        raise HTTPException(status_code=404, detail="Feed not found")
+
+    feed = await calendar_feeds.get(user_id)
+    headers = {"ETag": feed.etag, "Cache-Control": "no-cache"}
+    if feed.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(feed.last_modified, usegmt=True)
+
+    if _not_modified(request, feed.etag, feed.last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=feed.body, media_type="text/calendar; charset=utf-8", headers=headers)
+
+
+# --- auto-planner ---
+
+# catalog objects kept (per planned session) after the cheap transit-table ranking
+CANDIDATES_PER_SESSION = 4
+MIN_CANDIDATES = 40
 
-    if start_to is not None:
-        q = q.filter(ObservationSession.scheduled_start <= start_to)
-
-    sessions = q.order_by(ObservationSession.scheduled_start.asc()).all()
-
-    # Fetch location names for nicer ICS LOCATION fields
-    loc_ids = {s.location_id for s in sessions if s.location_id is not None}
-    loc_map = {}
-    if loc_ids:
-        locs = db.query(Location).filter(Location.id.in_(loc_ids)).all()
-        loc_map = {l.id: l for l in locs}
-
-    now = datetime.now(timezone.utc)
-    dur = timedelta(minutes=duration_minutes)
-
-    lines: list[str] = [
-        "BEGIN:VCALENDAR",
-        "VERSION:2.0",
-        "PRODID:-//AstroPlanner//EN",
-        "CALSCALE:GREGORIAN",
-        "METHOD:PUBLISH",
-        "X-WR-CALNAME:AstroPlanner Sessions",
-    ]
 
-    for s in sessions:
-        # SQLAlchemy model should give datetime; if it’s a string in your model,
-        # convert here with datetime.fromisoformat(...)
-        dt_start = s.scheduled_start
-        if isinstance(dt_start, str):
-            dt_start = datetime.fromisoformat(dt_start)
-
-        dt_end = dt_start + dur
-
-        loc = loc_map.get(s.location_id)
-        loc_name = loc.name if loc else ""
-        loc_coords = ""
-        if loc and loc.latitude is not None and loc.longitude is not None:
-            loc_coords = f"{loc.latitude},{loc.longitude}"
-
-        summary = f"Observe: {s.target_name}"
-        description = f"Status: {s.status}"
-        if loc_coords:
-            description += f"\\nCoords: {loc_coords}"
-
-        uid = f"session-{s.id}@astroplanner"
-
-        lines += [
-            "BEGIN:VEVENT",
-            f"UID:{_ics_escape(uid)}",
-            f"DTSTAMP:{_ics_dt_utc(now)}",
-            f"DTSTART:{_ics_dt_utc(dt_start)}",
-            f"DTEND:{_ics_dt_utc(dt_end)}",
-            f"SUMMARY:{_ics_escape(summary)}",
-            f"DESCRIPTION:{_ics_escape(description)}",
-        ]
-
-        if loc_name:
-            lines.append(f"LOCATION:{_ics_escape(loc_name)}")
-
-        # Optional: reflect status in iCal terms
-        if s.status == "cancelled":
-            lines.append("STATUS:CANCELLED")
-        elif s.status == "completed":
-            lines.append("STATUS:CONFIRMED")
+class AutoPlanRequest(BaseModel):
+    location_id: int
+    night: Optional[date] = Field(default=None, alias="date")  # the evening's date
+    tz: Optional[str] = None
+    targets: Optional[List[str]] = None  # planets, "Moon" or catalog names; omit to pick the best
+    best: int = Field(default=6, ge=1, le=50)  # most sessions to plan
+    min_alt: float = Field(default=DSO_MIN_ALT, ge=0, le=80)
+    max_mag: Optional[float] = None
+    darkness: Literal["civil", "nautical", "astronomical"] = "astronomical"
+    session_minutes: int = Field(default=60, ge=10, le=8 * 60)
+    gap_minutes: int = Field(default=10, ge=0, le=120)  # slew / setup between sessions
+    step_minutes: int = Field(default=5, ge=1, le=30)  # grid resolution
+    create: bool = True  # False: dry run, nothing is saved
+
+    class Config:
+        populate_by_name = True
+
+
+class PlannedSession(BaseModel):
+    target_name: str
+    kind: Literal["planet", "moon", "dso"]
+    start: datetime
+    end: datetime
+    min_altitude_deg: float
+    max_altitude_deg: float
+    score: float  # mean over the session, same scale as /targets/visible
+    session_id: Optional[int] = None
+
+
+class AutoPlan(BaseModel):
+    date: date
+    timezone: str
+    dark_start: Optional[datetime] = None
+    dark_end: Optional[datetime] = None
+    sessions: List[PlannedSession]
+    total_score: float
+    unscheduled: List[str] = []  # requested targets that didn't fit
+
+
+@lru_cache(maxsize=1)
+def _catalog_names() -> Dict[str, int]:
+    # full name and the designation in parentheses: "Andromeda Galaxy (M31)" / "M31"
+    index: Dict[str, int] = {}
+    for i, name in enumerate(CATALOG.names):
+        name = str(name)
+        index.setdefault(name.casefold(), i)
+        for alias in re.findall(r"\(([^)]+)\)", name):
+            index.setdefault(alias.strip().casefold(), i)
+    return index
+
+
+def _resolve_targets(wanted: List[str]) -> tuple[List[str], List[int], Dict[str, str]]:
+    """
+    Requested names -> (solar-system bodies, catalog indices, requested -> full name).
+    400 on unknown names.
+    """
+    bodies = {n.casefold(): n for n in [*get_ephemeris().planets, "Moon"]}
+    catalog = _catalog_names()
+    solar: List[str] = []
+    idx: List[int] = []
+    names: Dict[str, str] = {}
+    unknown: List[str] = []
+    for name in dict.fromkeys(w.strip() for w in wanted if w.strip()):
+        key = name.casefold()
+        if key in bodies:
+            solar.append(bodies[key])
+            names[name] = bodies[key]
+        elif key in catalog:
+            idx.append(catalog[key])
+            names[name] = str(CATALOG.names[catalog[key]])
         else:
-            lines.append("STATUS:TENTATIVE")
+            unknown.append(name)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown targets: {', '.join(unknown)}")
+    return solar, sorted(set(idx)), names
 
-        lines.append("END:VEVENT")
 
-    lines.append("END:VCALENDAR")
+def _rank_catalog(loc: Site, dark_start: datetime, dark_end: datetime, req: AutoPlanRequest) -> np.ndarray:
+    # cheap pre-selection: best-window score from hour-angle math, no grid yet
+    keep = max(req.best * CANDIDATES_PER_SESSION, MIN_CANDIDATES)
+    idx, table, score = catalog_window_scores(
+        loc.latitude, loc.longitude, dark_start, dark_end, req.min_alt, req.max_mag
+    )
+    if len(idx) <= keep:
+        return idx
+    rank = score + np.nan_to_num(table.window_end - table.window_start)  # longer windows fit a session better
+    return idx[np.argsort(-rank, kind="stable")[:keep]]
 
-    ics = "\r\n".join(lines) + "\r\n"
-    filename = "astroplanner.ics"
 
-    return Response(
-        content=ics,
-        media_type="text/calendar; charset=utf-8",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+def _auto_plan(loc: Site, req: AutoPlanRequest) -> AutoPlan:
+    events = night_for(loc, req.night, req.tz)
+    solar, idx, requested = _resolve_targets(req.targets) if req.targets else (None, None, {})
+
+    # grid over the dark part of the night; without dusk/dawn events (polar
+    # night / midnight sun) take the whole night and let the Sun mask decide
+    window_start, window_end = night_window(loc.longitude, events.date, req.tz or loc.timezone)
+    dusk = getattr(events, f"{req.darkness}_dusk") or window_start
+    dawn = getattr(events, f"{req.darkness}_dawn") or window_end
+    plan = AutoPlan(
+        date=events.date,
+        timezone=events.timezone,
+        dark_start=getattr(events, f"{req.darkness}_dusk"),
+        dark_end=getattr(events, f"{req.darkness}_dawn"),
+        sessions=[],
+        total_score=0.0,
+        unscheduled=list(requested),
+    )
+    if dawn <= dusk:
+        return plan
+
+    step = timedelta(minutes=req.step_minutes)
+    start = datetime.fromtimestamp(
+        math.ceil(dusk.timestamp() / step.total_seconds()) * step.total_seconds(), timezone.utc
     )
+    n_slots = int((dawn - start) / step)
+    length = math.ceil(req.session_minutes / req.step_minutes)
+    gap = math.ceil(req.gap_minutes / req.step_minutes)
+    if n_slots < length:
+        return plan
+
+    if idx is None:
+        idx = _rank_catalog(loc, dusk, dawn, req)
+    idx = np.asarray(idx, dtype=int)
+    fixed = CATALOG.star(idx) if len(idx) else None
+
+    offsets = np.arange(n_slots) * step.total_seconds()
+    t = get_timescale().utc(start.year, start.month, start.day, start.hour, start.minute, start.second + offsets)
+    series = sky_series(loc.latitude, loc.longitude, t, fixed)
+    sun_alt = series.sun_alt_deg
+    dark = sun_alt <= DARKNESS_SUN_ALT[req.darkness]
+
+    rows = []  # (name, kind, alt, elong)
+    for body in series.planets:
+        if solar is None or body.name in solar:
+            rows.append((body.name, "planet", body.alt_deg, body.elong_deg))
+    if solar is None or "Moon" in solar:
+        rows.append(("Moon", "moon", series.moon.alt_deg, None))
+    for name, alt in zip(CATALOG.names[idx], series.fixed_alt_deg):
+        rows.append((str(name), "dso", alt, None))
+    if not rows:
+        return plan
+
+    alt = np.array([r[2] for r in rows])
+    score = np.array([np.broadcast_to(visibility_score(a, sun_alt, e, k), sun_alt.shape) for _, k, a, e in rows])
+    feasible = np.array([visibility_mask(n, k, a, sun_alt, e) for n, k, a, e in rows]) & (alt >= req.min_alt) & dark
+
+    blocks = schedule(block_values(score, feasible, length), length, gap, req.best)
+    blocks.sort(key=lambda b: b.start)
+
+    for b in blocks:
+        name, kind = rows[b.target][0], rows[b.target][1]
+        block_alt = alt[b.target, b.start:b.start + length]
+        session_start = start + b.start * step
+        plan.sessions.append(
+            PlannedSession(
+                target_name=name,
+                kind=kind,
+                start=session_start,
+                end=session_start + timedelta(minutes=req.session_minutes),
+                min_altitude_deg=float(block_alt.min()),
+                max_altitude_deg=float(block_alt.max()),
+                score=b.value,
+            )
+        )
+    plan.total_score = float(sum(b.value for b in blocks))
+    planned = {s.target_name for s in plan.sessions}
+    plan.unscheduled = [n for n, full in requested.items() if full not in planned]
+    return plan
+
+
+@router.post("/auto", response_model=AutoPlan)
+async def auto_plan(
+    req: AutoPlanRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Fill a night with sessions: up to `best` targets (the named ones, or the
+    best available), each `session_minutes` long, above `min_alt` and inside
+    the chosen darkness for the whole session, `gap_minutes` apart. Maximizes
+    the total score over a precomputed altitude grid, then creates the
+    sessions in one insert (unless `create` is false).
+    """
+    loc = await _get_user_location(db, req.location_id, current_user.id)
+    plan = await run_astro(_auto_plan, Site.of(loc), req)
+
+    if req.create and plan.sessions:
+        ids = (
+            await db.scalars(
+                insert(ObservationSession).returning(ObservationSession.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "target_name": s.target_name,
+                        "scheduled_start": _utc_naive(s.start),
+                        "status": "planned",
+                        "owner_id": current_user.id,
+                        "location_id": loc.id,
+                    }
+                    for s in plan.sessions
+                ],
+            )
+        ).all()
+        await db.commit()
+        for s, session_id in zip(plan.sessions, ids):
+            s.session_id = session_id
+            calendar_feeds.session_changed(current_user.id, session_id)
+    return plan
+
+
+# --- multi-site comparison ---
+
+MAX_COMPARE_SITES = 50
+# dark hours beyond this don't make a site any better for one night out
+FULL_NIGHT_HOURS = 8.0
+
+
+class SiteForecast(BaseModel):
+    location_id: int
+    name: str
+    rank: int
+    score: float  # target_score scaled by dark time, Moon and clouds
+    night: Optional[date] = Field(default=None, alias="date")
+    timezone: Optional[str] = None
+    dark_start: Optional[datetime] = None
+    dark_end: Optional[datetime] = None
+    dark_hours: float = 0.0
+    moon_illumination: Optional[float] = None
+    moon_up_fraction: Optional[float] = None  # of the dark hours
+    cloud_cover: Optional[float] = None  # mean % over the dark hours
+    target_score: float = 0.0
+    top_targets: List[str] = []
+    error: Optional[str] = None
+
+    class Config:
+        populate_by_name = True
+
+
+def _site_tz(loc: Location) -> Optional[str]:
+    # location timezones aren't validated on save; a bad one falls back to solar time
+    if not loc.timezone:
+        return None
+    try:
+        ZoneInfo(loc.timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+    return loc.timezone
+
+
+def _mean_cloud_cover(hourlies: List[dict], start: datetime, end: datetime) -> Optional[float]:
+    values = []
+    for hourly in hourlies:
+        for t, cover in zip(hourly.get("time") or [], hourly.get("cloud_cover") or []):
+            when = datetime.fromisoformat(t).replace(tzinfo=timezone.utc)  # requested in UTC
+            if cover is not None and start - timedelta(minutes=30) <= when <= end + timedelta(minutes=30):
+                values.append(cover)
+    return float(np.mean(values)) if values else None
+
+
+def _site_skies(jobs: List[tuple]) -> List[SiteSky]:
+    return [site_sky(*job) for job in jobs]
+
+
+@router.get("/sites", response_model=List[SiteForecast])
+async def compare_sites(
+    night: Optional[date] = Query(default=None, alias="date"),  # the evening's date; default tonight per site
+    darkness: Literal["civil", "nautical", "astronomical"] = "astronomical",
+    min_alt: float = Query(default=DSO_MIN_ALT, ge=0, le=80),
+    max_mag: Optional[float] = None,
+    top: int = Query(default=10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Every location of the user ranked for one night: dark hours, Moon,
+    mean cloud cover over the dark hours, and the mean score of the best
+    `top` targets. Sky math for all sites runs in parallel on the astronomy
+    pool while the forecasts for all sites go out in one batched fetch.
+    """
+    locations = (
+        await db.scalars(
+            select(Location)
+            .where(Location.owner_id == current_user.id)
+            .order_by(Location.id)
+            .limit(MAX_COMPARE_SITES)
+        )
+    ).all()
+    sites = [loc for loc in locations if loc.latitude is not None and loc.longitude is not None]
+
+    tz_names = {loc.id: _site_tz(loc) for loc in sites}
+    days = {
+        loc.id: night or datetime.now(ZoneInfo(tz_names[loc.id]) if tz_names[loc.id] else timezone.utc).date()
+        for loc in sites
+    }
+    # UTC days the night can touch, so the forecasts can go out before the almanac is known
+    points = []
+    windows = {}
+    for loc in sites:
+        windows[loc.id] = start, end = night_window(loc.longitude, days[loc.id], tz_names[loc.id])
+        for d in {start.date(), end.date()}:
+            points.append((loc.latitude, loc.longitude, d))
+
+    # one pool job per worker rather than per site: same parallelism, and a
+    # single request can't fill the pool's queue by itself
+    jobs = [
+        (loc.latitude, loc.longitude, tz_names[loc.id], days[loc.id], darkness, min_alt, max_mag, top)
+        for loc in sites
+    ]
+    n_chunks = max(1, min(len(jobs), ASTRO_POOL_WORKERS))
+    chunks = [jobs[i::n_chunks] for i in range(n_chunks)]
+    forecasts, *results = await asyncio.gather(
+        get_hourly_forecasts(points),
+        *(run_astro(_site_skies, chunk) for chunk in chunks if chunk),
+    )
+    skies = [None] * len(jobs)
+    for i, chunk_result in enumerate(results):
+        skies[i::n_chunks] = chunk_result
+
+    out: List[SiteForecast] = []
+    for loc, site in zip(sites, skies):
+        site: SiteSky
+        start, end = windows[loc.id]
+        keys = [forecast_key(loc.latitude, loc.longitude, d) for d in sorted({start.date(), end.date()})]
+        failed = [forecasts[k] for k in keys if isinstance(forecasts[k], WeatherError)]
+        cloud = None
+        if not failed and site.dark_hours:
+            dark_start = site.dark_start or start
+            dark_end = site.dark_end or end
+            cloud = _mean_cloud_cover([forecasts[k] for k in keys], dark_start, dark_end)
+
+        moon_factor = 1.0 - 0.5 * site.night.moon_illumination * site.moon_up_fraction
+        score = site.target_score * min(site.dark_hours, FULL_NIGHT_HOURS) / FULL_NIGHT_HOURS * moon_factor
+        if cloud is not None:
+            score *= 1.0 - cloud / 100.0
+        out.append(
+            SiteForecast(
+                location_id=loc.id,
+                name=loc.name,
+                rank=0,
+                score=score,
+                night=site.night.date,
+                timezone=site.night.timezone,
+                dark_start=site.dark_start,
+                dark_end=site.dark_end,
+                dark_hours=site.dark_hours,
+                moon_illumination=site.night.moon_illumination,
+                moon_up_fraction=site.moon_up_fraction,
+                cloud_cover=cloud,
+                target_score=site.target_score,
+                top_targets=[name for name, _ in site.top_targets],
+                error=str(failed[0]) if failed else None,
+            )
+        )
+
+    # sites without a forecast can't be compared fairly: after the ones with one
+    out.sort(key=lambda f: (f.cloud_cover is None and f.dark_hours > 0, -f.score))
+    for loc in locations:
+        if loc not in sites:
+            out.append(SiteForecast(location_id=loc.id, name=loc.name, rank=0, score=0.0, error="Location has no coordinates"))
+    for i, f in enumerate(out, start=1):
+        f.rank = i
+    return out
@@ -1,15 +1,21 @@
-from typing import List
+from functools import lru_cache
+from typing import List, Literal, Optional
 from zoneinfo import ZoneInfo
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
-from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timezone
 from typing import Iterable
-from app.core.deps import get_current_user
-from app.db.database import get_db
+from app.core.calendar_feed import calendar_feeds
+from app.core.config import SESSION_IMPORT_MAX_ROWS
+from app.core.deps import Principal, get_current_user
+from app.core.pagination import MAX_PAGE_SIZE, paginate
+from app.core.session_import import ImportFormatError, media_type, parse_rows
+from app.db.database import get_async_db, get_async_read_db
 from app.models.location import Location
 from app.models.observation_session import ObservationSession
-from app.models.user import User
 from app.schemas.session import (
     SessionCreate,
     SessionUpdate,
@@ -34,16 +40,27 @@ def as_read_model(s: ObservationSession) -> SessionRead:
         status=s.status,
     )
 
-def _get_user_session(db: Session, session_id: int, user_id: int) -> ObservationSession | None:
-    return (
-        db.query(ObservationSession)
-        .filter(
+async def _get_user_session(db: AsyncSession, session_id: int, user_id: int) -> ObservationSession | None:
+    return await db.scalar(
+        select(ObservationSession).where(
             ObservationSession.id == session_id,
             ObservationSession.owner_id == user_id,
         )
-        .first()
     )
 
+async def _get_user_location(db: AsyncSession, location_id: int, user_id: int) -> Location | None:
+    return await db.scalar(
+        select(Location).where(
+            Location.id == location_id,
+            Location.owner_id == user_id,
+        )
+    )
+
+@lru_cache(maxsize=256)
+def _zone(tz_name: str) -> ZoneInfo:
+    return ZoneInfo(tz_name)
+
+
 def local_str_to_utc_naive(when_local: str, tz_name: str) -> datetime:
     # when_local: "YYYY-MM-DDTHH:mm"
     try:
@@ -52,47 +69,40 @@ def local_str_to_utc_naive(when_local: str, tz_name: str) -> datetime:
         raise HTTPException(status_code=400, detail="Invalid scheduled_start_local format")
 
     try:
-        tz = ZoneInfo(tz_name)
-    except ZoneInfoNotFoundError:
+        tz = _zone(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
         raise HTTPException(status_code=400, detail="Invalid timezone")
 
     dt_local = dt_local_naive.replace(tzinfo=tz)
     dt_utc = dt_local.astimezone(timezone.utc)
     return dt_utc.replace(tzinfo=None)  # store naive UTC
 
-@router.post("/", response_model=SessionRead, status_code=status.HTTP_201_CREATED)
-def create_session(
-    session_in: SessionCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    location = (
-        db.query(Location)
-        .filter(
-            Location.id == session_in.location_id,
-            Location.owner_id == current_user.id,
-        )
-        .first()
-    )
-    if not location:
-        raise HTTPException(status_code=404, detail="Location not found")
-
-    # location timezone, fall back to incoming tz
-    tz_name = location.timezone or session_in.tz
-
+def _scheduled_start_utc(session_in: SessionCreate, tz_name: Optional[str]) -> datetime:
     if session_in.scheduled_start is not None:
         scheduled = session_in.scheduled_start
         if scheduled.tzinfo is None:
             scheduled = scheduled.replace(tzinfo=timezone.utc)
-        scheduled_start = scheduled.astimezone(timezone.utc).replace(tzinfo=None)
+        return scheduled.astimezone(timezone.utc).replace(tzinfo=None)
 
-    elif session_in.scheduled_start_local is not None:
+    if session_in.scheduled_start_local is not None:
         if not tz_name:
             raise HTTPException(status_code=400, detail="Timezone required for scheduled_start_local")
-        scheduled_start = local_str_to_utc_naive(session_in.scheduled_start_local, tz_name)
+        return local_str_to_utc_naive(session_in.scheduled_start_local, tz_name)
 
-    else:
-        raise HTTPException(status_code=400, detail="Must provide scheduled_start or scheduled_start_local")
+    raise HTTPException(status_code=400, detail="Must provide scheduled_start or scheduled_start_local")
+
+@router.post("/", response_model=SessionRead, status_code=status.HTTP_201_CREATED)
+async def create_session(
+    session_in: SessionCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    location = await _get_user_location(db, session_in.location_id, current_user.id)
+    if not location:
+        raise HTTPException(status_code=404, detail="Location not found")
+
+    # location timezone, fall back to incoming tz
+    scheduled_start = _scheduled_start_utc(session_in, location.timezone or session_in.tz)
 
     session = ObservationSession(
         target_name=session_in.target_name,
@@ -103,34 +113,159 @@ def create_session(
     )
 
     db.add(session)
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+    await db.refresh(session)
+    calendar_feeds.session_changed(current_user.id, session.id)
     return as_read_model(session)
 
 
+MAX_IMPORT_ERRORS = 50
 
 
-@router.get("/", response_model=List[SessionRead])
-def list_sessions(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+async def _read_import_rows(request: Request) -> list:
+    content_type = request.headers.get("content-type", "")
+    filename = None
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Upload the sessions as a 'file' field")
+        content_type, filename = upload.content_type, upload.filename
+        data = await upload.read()
+    else:
+        data = await request.body()
+
+    try:
+        return parse_rows(data, media_type(content_type, filename))
+    except ImportFormatError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post("/bulk", response_model=List[SessionRead], status_code=status.HTTP_201_CREATED)
+async def create_sessions_bulk(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
+    """
+    Create many sessions at once: a JSON array, NDJSON, or CSV with a header
+    row (raw body, or a multipart upload in a `file` field). Each row takes
+    the same fields as POST /sessions/. All or nothing: if any row is bad
+    nothing is created and the 422 lists the bad rows (0-based).
+    """
+    rows = await _read_import_rows(request)
+    if not rows:
+        raise HTTPException(status_code=400, detail="No sessions to import")
+    if len(rows) > SESSION_IMPORT_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {SESSION_IMPORT_MAX_ROWS} sessions per import")
+
+    errors = []
+    parsed: List[tuple[int, SessionCreate]] = []
+    for i, row in enumerate(rows):
+        try:
+            parsed.append((i, SessionCreate.model_validate(row)))
+        except ValidationError as exc:
+            first = exc.errors()[0]
+            field = ".".join(str(p) for p in first["loc"])
+            errors.append({"row": i, "msg": f"{field}: {first['msg']}" if field else first["msg"]})
+
+    # ownership for every referenced location in one query
+    location_ids = {s.location_id for _, s in parsed}
+    zones = dict(
+        (await db.execute(
+            select(Location.id, Location.timezone).where(
+                Location.id.in_(location_ids),
+                Location.owner_id == current_user.id,
+            )
+        )).all()
+    ) if location_ids else {}
+
+    values = []
+    for i, session_in in parsed:
+        if session_in.location_id not in zones:
+            errors.append({"row": i, "msg": "Location not found"})
+            continue
+        try:
+            scheduled_start = _scheduled_start_utc(session_in, zones[session_in.location_id] or session_in.tz)
+        except HTTPException as exc:
+            errors.append({"row": i, "msg": exc.detail})
+            continue
+        values.append({
+            "target_name": session_in.target_name,
+            "scheduled_start": scheduled_start,
+            "status": session_in.status or "planned",
+            "owner_id": current_user.id,
+            "location_id": session_in.location_id,
+        })
+
+    if errors:
+        errors.sort(key=lambda e: e["row"])
+        raise HTTPException(status_code=422, detail=errors[:MAX_IMPORT_ERRORS])
+
+    # one multi-row INSERT ... RETURNING, one commit
     sessions = (
-        db.query(ObservationSession)
-        .filter(ObservationSession.owner_id == current_user.id)
-        .order_by(ObservationSession.scheduled_start.desc())
-        .all()
+        await db.scalars(
+            insert(ObservationSession).returning(ObservationSession, sort_by_parameter_order=True),
+            values,
+        )
+    ).all()
+    await db.commit()
+    for s in sessions:
+        calendar_feeds.session_changed(current_user.id, s.id)
+    return [as_read_model(s) for s in sessions]
+
+
+
+
+@router.get("/", response_model=List[SessionRead])
+async def list_sessions(
+    response: Response,
+    status_filter: Optional[str] = Query(default=None, alias="status"),
+    location_id: Optional[int] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    order: Literal["asc", "desc"] = "desc",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = False,  # X-Total-Count costs an extra COUNT(*)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Newest first by default. Paged on (scheduled_start, id): pass the
+    X-Next-Cursor header of one page as `cursor` to get the next.
+    """
+    q = select(ObservationSession).where(ObservationSession.owner_id == current_user.id)
+    if status_filter is not None:
+        q = q.where(ObservationSession.status == status_filter)
+    if location_id is not None:
+        q = q.where(ObservationSession.location_id == location_id)
+    # DB stores naive UTC
+    if start_from is not None:
+        q = q.where(ObservationSession.scheduled_start >= to_utc_aware(start_from).replace(tzinfo=None))
+    if start_to is not None:
+        q = q.where(ObservationSession.scheduled_start <= to_utc_aware(start_to).replace(tzinfo=None))
+
+    sessions = await paginate(
+        db,
+        q,
+        (ObservationSession.scheduled_start, ObservationSession.id),
+        response,
+        cursor=cursor,
+        limit=limit,
+        descending=order == "desc",
+        include_total=include_total,
     )
     return [as_read_model(s) for s in sessions]
 
 
 @router.get("/{session_id}", response_model=SessionRead)
-def get_session(
+async def get_session(
     session_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    session = _get_user_session(db, session_id, current_user.id)
+    session = await _get_user_session(db, session_id, current_user.id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     return as_read_model(session)
@@ -138,13 +273,13 @@ def get_session(
 
 
 @router.patch("/{session_id}", response_model=SessionRead)
-def update_session(
+async def update_session(
     session_id: int,
     session_in: SessionUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    session = _get_user_session(db, session_id, current_user.id)
+    session = await _get_user_session(db, session_id, current_user.id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
@@ -154,28 +289,14 @@ def update_session(
     location: Location | None = None
     new_location_id = data.get("location_id")
     if new_location_id is not None:
-        location = (
-            db.query(Location)
-            .filter(
-                Location.id == new_location_id,
-                Location.owner_id == current_user.id,
-            )
-            .first()
-        )
+        location = await _get_user_location(db, new_location_id, current_user.id)
         if not location:
             raise HTTPException(status_code=404, detail="Location not found")
 
     # If scheduled_start_local is provided but location wasn't changed,
     # load the existing session location can prefer its timezone.
     if "scheduled_start_local" in data and location is None:
-        location = (
-            db.query(Location)
-            .filter(
-                Location.id == session.location_id,
-                Location.owner_id == current_user.id,
-            )
-            .first()
-        )
+        location = await _get_user_location(db, session.location_id, current_user.id)
 
     # Convert scheduled_start_local -> scheduled_start 
     if "scheduled_start_local" in data:
@@ -198,30 +319,25 @@ def update_session(
     for field, value in data.items():
         setattr(session, field, value)
 
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+    await db.refresh(session)
+    calendar_feeds.session_changed(current_user.id, session.id)
     return as_read_model(session)
 
 
 
 
 @router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_session(
+async def delete_session(
     session_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    session = (
-        db.query(ObservationSession)
-        .filter(
-            ObservationSession.id == session_id,
-            ObservationSession.owner_id == current_user.id,
-        )
-        .first()
-    )
+    session = await _get_user_session(db, session_id, current_user.id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    db.delete(session)  
-    db.commit()
+    await db.delete(session)
+    await db.commit()
+    calendar_feeds.session_deleted(current_user.id, session_id)
     return None
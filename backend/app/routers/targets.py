@@ -1,46 +1,51 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 from typing import List, Literal, Optional
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from fastapi import APIRouter, Depends, HTTPException
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
-from sqlalchemy.orm import Session as DBSession
-
-from skyfield.api import load, wgs84, Star
-from skyfield import almanac
-
-from app.db.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.astro_pool import run_astro
+from app.core.config import (
+    VISIBLE_CACHE_DB,
+    VISIBLE_CACHE_GRID_DEG,
+    VISIBLE_CACHE_SIZE,
+    VISIBLE_CACHE_STEP_SECONDS,
+    VISIBLE_CACHE_TTL_SECONDS,
+)
+from app.core.ephemeris import get_timescale
+from app.core.night import night_window
+from app.core.planning import (
+    CATALOG,
+    DSO_MIN_ALT,
+    Site,
+    filter_mag,
+    night_for,
+    visibility_mask,
+    visibility_score,
+)
+from app.core.result_cache import ResultCache
+from app.core.sky import (
+    local_sidereal_hours,
+    radec_of_date,
+    sky_series,
+    sky_snapshot,
+    transit_table,
+)
+from app.db.database import get_async_read_db
 from app.models.location import Location
-from app.core.deps import get_current_user
-from app.models.user import User
+from app.core.deps import Principal, get_current_user
 
 router = APIRouter(prefix="/targets", tags=["targets"])
 
-# Skyfield globals 
-ts = load.timescale()
-eph = load("de421.bsp")  # Sun/Moon/planets
-earth = eph["earth"]
-sun = eph["sun"]
-
 PlanetName = Literal["Mercury", "Venus", "Mars", "Jupiter", "Saturn", "Uranus", "Neptune", "Moon"]
 
-PLANETS = {
-    "Mercury": eph["mercury"],
-    "Venus": eph["venus"],
-    "Mars": eph["mars"],
-    "Jupiter": eph["jupiter barycenter"],
-    "Saturn": eph["saturn barycenter"],
-    "Uranus": eph["uranus barycenter"],
-    "Neptune": eph["neptune barycenter"],
-}
-
-# Example fixed targets; 
-FIXED_TARGETS = [
-    # name, ra_hours, dec_degrees
-    ("Orion Nebula (M42)", 5 + 35/60, -(5 + 23/60)),
-    ("Andromeda Galaxy (M31)", 0 + 42/60, 41 + 16/60),
-    ("Pleiades (M45)", 3 + 47/60, 24 + 7/60),
-]
+# /visible answers, keyed by snapped site, time step and catalog version
+visible_cache = ResultCache("visible", VISIBLE_CACHE_SIZE, VISIBLE_CACHE_TTL_SECONDS, VISIBLE_CACHE_DB)
+CACHE_HEADER = "X-Cache"  # HIT / MISS / COALESCED / BYPASS
 
 class VisibleTarget(BaseModel):
     name: str
@@ -53,6 +58,52 @@ class VisibleTarget(BaseModel):
     reason: Optional[str] = None
     score: float
 
+class TargetCurve(BaseModel):
+    name: str
+    kind: Literal["planet", "moon", "dso", "star"]
+    altitude_deg: List[float]
+    azimuth_deg: List[float]
+    elongation_deg: Optional[List[float]] = None
+    visible: List[bool]
+    score: List[float]
+
+class VisibilityCurve(BaseModel):
+    times: List[datetime]
+    sun_altitude_deg: List[float]
+    targets: List[TargetCurve]
+
+class NightInfo(BaseModel):
+    date: date
+    timezone: str
+    sunset: Optional[datetime] = None
+    civil_dusk: Optional[datetime] = None
+    nautical_dusk: Optional[datetime] = None
+    astronomical_dusk: Optional[datetime] = None
+    astronomical_dawn: Optional[datetime] = None
+    nautical_dawn: Optional[datetime] = None
+    civil_dawn: Optional[datetime] = None
+    sunrise: Optional[datetime] = None
+    moonrise: Optional[datetime] = None
+    moonset: Optional[datetime] = None
+    moon_illumination: float
+
+class TargetWindow(BaseModel):
+    name: str
+    kind: Literal["planet", "moon", "dso", "star"]
+    magnitude: Optional[float] = None
+    rise: Optional[datetime] = None
+    transit: datetime
+    set: Optional[datetime] = None
+    transit_altitude_deg: float
+    window_start: Optional[datetime] = None
+    window_end: Optional[datetime] = None
+    best_time: Optional[datetime] = None
+    best_altitude_deg: Optional[float] = None
+    score: float
+
+# keep one request from asking for an unbounded time array
+MAX_CURVE_POINTS = 1000
+
 def _to_utc(dt: datetime) -> datetime:
     # If naive assume UTC
     if dt.tzinfo is None:
@@ -74,68 +125,99 @@ def _local_str_to_utc(when_local: str, tz_name: str) -> datetime:
     dt_local = dt_local_naive.replace(tzinfo=tz)
     return dt_local.astimezone(timezone.utc)
 
-def _score(alt: float, sun_alt: float, elong: Optional[float], kind: str) -> float:
-    # higher altitude + darker sky + better elongation
-    s = 0.0
-    s += max(0.0, min(alt, 90.0)) * 1.2
-    s += max(0.0, min((-sun_alt), 18.0)) * 1.0  # darker better
-    if elong is not None:
-        s += max(0.0, min(elong, 60.0)) * 0.3
-    if kind in ("planet", "moon"):
-        s += 5.0  # bump popular targets a bit
-    return s
+def _hours_after(ref: datetime, hours: float) -> Optional[datetime]:
+    if np.isnan(hours):
+        return None
+    return ref + timedelta(hours=float(hours))
 
-@router.get("/visible", response_model=List[VisibleTarget])
-def visible_targets(
-    location_id: int,
-    when: Optional[datetime] = None,          # old client support
-    when_local: Optional[str] = None,         
-    tz: Optional[str] = None,                 
-    db: DBSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    loc = (
-        db.query(Location)
-        .filter(Location.id == location_id, Location.owner_id == current_user.id)
-        .first()
+async def _get_user_location(db: AsyncSession, location_id: int, user_id: int) -> Location:
+    loc = await db.scalar(
+        select(Location).where(Location.id == location_id, Location.owner_id == user_id)
     )
     if not loc:
         raise HTTPException(status_code=404, detail="Location not found")
-
+    return loc
+
+def _resolve_when(
+    when: Optional[datetime],
+    when_local: Optional[str],
+    tz: Optional[str],
+    loc: Location,
+    field: str = "when",
+) -> datetime:
     # Pref local-string + tz, fallback to old 
     if when_local is not None:
         tz_name = tz or loc.timezone
         if not tz_name:
             raise HTTPException(status_code=400, detail="Timezone required")
-        when_utc = _local_str_to_utc(when_local, tz_name)
-    elif when is not None:
-        when_utc = _to_utc(when)
-    else:
-        raise HTTPException(status_code=400, detail="Provide when or when_local")
-    t = ts.from_datetime(when_utc)
+        return _local_str_to_utc(when_local, tz_name)
+    if when is not None:
+        return _to_utc(when)
+    raise HTTPException(status_code=400, detail=f"Provide {field} or {field}_local")
+
+@router.get("/visible", response_model=List[VisibleTarget])
+async def visible_targets(
+    location_id: int,
+    response: Response,
+    when: Optional[datetime] = None,          # old client support
+    when_local: Optional[str] = None,         
+    tz: Optional[str] = None,                 
+    max_mag: Optional[float] = None,
+    exact: bool = False,                      # exact time and place, skip the cache
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    loc = await _get_user_location(db, location_id, current_user.id)
+    when_utc = _resolve_when(when, when_local, tz, loc)
+    if exact:
+        response.headers[CACHE_HEADER] = "BYPASS"
+        # ephemeris math is CPU-bound: astronomy pool, not the event loop or the shared threadpool
+        return await run_astro(_visible_targets, Site.of(loc), when_utc, max_mag)
+
+    # polling clients ask about the same place every few seconds: compute once
+    # per grid cell and time step, at the cell centre and the step boundary
+    site, when_utc = _snap_site(loc.latitude, loc.longitude), _snap_time(when_utc)
+    key = f"{site.latitude:.4f},{site.longitude:.4f},{int(when_utc.timestamp())},{max_mag},{CATALOG.version}"
+
+    async def compute() -> List[dict]:
+        rows = await run_astro(_visible_targets, site, when_utc, max_mag)
+        return [row.model_dump(mode="json") for row in rows]
+
+    rows, outcome = await visible_cache.get_or_compute(key, compute)
+    response.headers[CACHE_HEADER] = outcome
+    return rows
+
 
-    observer = wgs84.latlon(loc.latitude, loc.longitude)
-    topo = earth + observer
+def _snap_site(latitude: float, longitude: float) -> Site:
+    g = VISIBLE_CACHE_GRID_DEG
+    return Site(round(round(latitude / g) * g, 4), round(round(longitude / g) * g, 4))
 
-    # Sun altitude (darkness)
-    sun_app = topo.at(t).observe(sun).apparent()
-    sun_alt, sun_az, _ = sun_app.altaz()
-    sun_alt_deg = float(sun_alt.degrees)
+
+def _snap_time(when_utc: datetime) -> datetime:
+    step = VISIBLE_CACHE_STEP_SECONDS
+    ts = round(when_utc.timestamp() / step) * step
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+def _visible_targets(loc: Site, when_utc: datetime, max_mag: Optional[float]) -> List[VisibleTarget]:
+    t = get_timescale().from_datetime(when_utc)
+
+    # cull catalog objects that can't be above the horizon limit right now
+    lst = local_sidereal_hours(loc.latitude, loc.longitude, t)
+    idx = filter_mag(CATALOG.above(loc.latitude, lst, DSO_MIN_ALT), max_mag)
+    fixed = CATALOG.star(idx) if len(idx) else None
+
+    snap = sky_snapshot(loc.latitude, loc.longitude, t, fixed)
+    sun_alt_deg = snap.sun_alt_deg
 
     out: List[VisibleTarget] = []
 
     # Planets 
-    for name, body in PLANETS.items():
-        app = topo.at(t).observe(body).apparent()
-        alt, az, _ = app.altaz()
-        alt_deg = float(alt.degrees)
-        az_deg = float(az.degrees)
-
-        # elongation from Sun (angular separation on sky)
-        # compute separation between body & sun as seen by observer
-        body_vec = topo.at(t).observe(body).apparent()
-        sun_vec = topo.at(t).observe(sun).apparent()
-        elong_deg = float(body_vec.separation_from(sun_vec).degrees)
+    for body in snap.planets:
+        name = body.name
+        alt_deg = body.alt_deg
+        az_deg = body.az_deg
+        elong_deg = body.elong_deg
 
         visible = True
         reason = None
@@ -155,7 +237,7 @@ def visible_targets(
                 visible = False
                 reason = "Too close to the Sun (glare / low elongation)"
 
-        score = _score(alt_deg, sun_alt_deg, elong_deg, "planet")
+        score = visibility_score(alt_deg, sun_alt_deg, elong_deg, "planet")
         out.append(
             VisibleTarget(
                 name=name,
@@ -171,11 +253,8 @@ def visible_targets(
         )
 
     # Moon 
-    moon = eph["moon"]
-    moon_app = topo.at(t).observe(moon).apparent()
-    moon_alt, moon_az, _ = moon_app.altaz()
-    moon_alt_deg = float(moon_alt.degrees)
-    moon_az_deg = float(moon_az.degrees)
+    moon_alt_deg = snap.moon.alt_deg
+    moon_az_deg = snap.moon.az_deg
 
     visible = moon_alt_deg > 5 and sun_alt_deg < 0  # moon is bright; allow earlier
     reason = None
@@ -192,30 +271,26 @@ def visible_targets(
             elongation_deg=None,
             visible=visible,
             reason=reason,
-            score=_score(moon_alt_deg, sun_alt_deg, None, "moon"),
+            score=visibility_score(moon_alt_deg, sun_alt_deg, None, "moon"),
         )
     )
 
-    # Fixed DSOs (RA/Dec) 
-    for name, ra_h, dec_d in FIXED_TARGETS:
-        star = Star(ra_hours=ra_h, dec_degrees=dec_d)
-        app = topo.at(t).observe(star).apparent()
-        alt, az, _ = app.altaz()
-        alt_deg = float(alt.degrees)
-        az_deg = float(az.degrees)
-
+    # Fixed DSOs (RA/Dec), already evaluated in one array observation
+    for name, alt, az in zip(CATALOG.names[idx], snap.fixed_alt_deg, snap.fixed_az_deg):
+        alt_deg = float(alt)
+        az_deg = float(az)
         visible = True
         reason = None
-        if alt_deg < 15:
+        if alt_deg < DSO_MIN_ALT:
             visible = False
-            reason = "Too low (below 15° altitude)"
+            reason = f"Too low (below {DSO_MIN_ALT:g}° altitude)"
         elif sun_alt_deg > -6:
             visible = False
             reason = "Sky too bright (needs darker than civil twilight)"
 
         out.append(
             VisibleTarget(
-                name=name,
+                name=str(name),
                 kind="dso",
                 altitude_deg=alt_deg,
                 azimuth_deg=az_deg,
@@ -223,10 +298,190 @@ def visible_targets(
                 elongation_deg=None,
                 visible=visible,
                 reason=reason,
-                score=_score(alt_deg, sun_alt_deg, None, "dso"),
+                score=visibility_score(alt_deg, sun_alt_deg, None, "dso"),
             )
         )
 
     # return visible first, sorted by score
     out.sort(key=lambda x: (not x.visible, -x.score))
     return out
+
+
+@router.get("/visibility-curve", response_model=VisibilityCurve)
+async def visibility_curve(
+    location_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    start_local: Optional[str] = None,
+    end_local: Optional[str] = None,
+    tz: Optional[str] = None,
+    step_minutes: int = Query(default=10, ge=1, le=240),
+    max_mag: Optional[float] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Altitude/azimuth/score series for every target between start and end.
+    One Skyfield time array, one vectorized evaluation per body.
+    """
+    loc = await _get_user_location(db, location_id, current_user.id)
+    start_utc = _resolve_when(start, start_local, tz, loc, field="start")
+    end_utc = _resolve_when(end, end_local, tz, loc, field="end")
+    if end_utc <= start_utc:
+        raise HTTPException(status_code=400, detail="end must be after start")
+
+    step_s = step_minutes * 60
+    n_points = int((end_utc - start_utc).total_seconds() // step_s) + 1
+    if n_points > MAX_CURVE_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many points ({n_points}); use a larger step_minutes or a shorter range",
+        )
+
+    return await run_astro(_visibility_curve, Site.of(loc), start_utc, step_s, n_points, max_mag)
+
+
+def _visibility_curve(
+    loc: Site,
+    start_utc: datetime,
+    step_s: int,
+    n_points: int,
+    max_mag: Optional[float],
+) -> VisibilityCurve:
+    offsets = np.arange(n_points) * step_s
+    t = get_timescale().utc(
+        start_utc.year, start_utc.month, start_utc.day,
+        start_utc.hour, start_utc.minute, start_utc.second + offsets,
+    )
+
+    # catalog objects that never get above the horizon limit here are dropped
+    idx = filter_mag(CATALOG.ever_above(loc.latitude, DSO_MIN_ALT), max_mag)
+    fixed = CATALOG.star(idx) if len(idx) else None
+
+    series = sky_series(loc.latitude, loc.longitude, t, fixed)
+    sun_alt = series.sun_alt_deg
+
+    targets: List[TargetCurve] = []
+
+    def add(name: str, kind: str, alt, az, elong=None):
+        targets.append(
+            TargetCurve(
+                name=name,
+                kind=kind,
+                altitude_deg=alt.tolist(),
+                azimuth_deg=az.tolist(),
+                elongation_deg=elong.tolist() if elong is not None else None,
+                visible=visibility_mask(name, kind, alt, sun_alt, elong).tolist(),
+                score=visibility_score(alt, sun_alt, elong, kind).tolist(),
+            )
+        )
+
+    for body in series.planets:
+        add(body.name, "planet", body.alt_deg, body.az_deg, body.elong_deg)
+
+    add("Moon", "moon", series.moon.alt_deg, series.moon.az_deg)
+
+    for name, alt, az in zip(CATALOG.names[idx], series.fixed_alt_deg, series.fixed_az_deg):
+        add(str(name), "dso", alt, az)
+
+    return VisibilityCurve(
+        times=[start_utc + timedelta(seconds=int(o)) for o in offsets],
+        sun_altitude_deg=sun_alt.tolist(),
+        targets=targets,
+    )
+
+
+@router.get("/night", response_model=NightInfo)
+async def night_info(
+    location_id: int,
+    night: Optional[date] = Query(default=None, alias="date"),  # the evening's date
+    tz: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Sunset, civil/nautical/astronomical dusk and dawn, moonrise/moonset and
+    Moon illumination for one night. Cached per (rounded site, date).
+    """
+    loc = await _get_user_location(db, location_id, current_user.id)
+    events = await run_astro(night_for, Site.of(loc), night, tz)
+    return NightInfo(**vars(events))
+
+
+@router.get("/tonight", response_model=List[TargetWindow])
+async def best_tonight(
+    location_id: int,
+    night: Optional[date] = Query(default=None, alias="date"),
+    tz: Optional[str] = None,
+    min_alt: float = Query(default=DSO_MIN_ALT, ge=0, le=80),
+    max_mag: Optional[float] = None,
+    limit: int = Query(default=50, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Rise/transit/set and the best window above min_alt inside astronomical
+    darkness for every catalog object, best first. Computed for the whole
+    catalog at once; nights without astronomical darkness get no windows.
+    """
+    loc = await _get_user_location(db, location_id, current_user.id)
+    return await run_astro(_best_tonight, Site.of(loc), night, tz, min_alt, max_mag, limit)
+
+
+def _best_tonight(
+    loc: Site,
+    night: Optional[date],
+    tz: Optional[str],
+    min_alt: float,
+    max_mag: Optional[float],
+    limit: int,
+) -> List[TargetWindow]:
+    events = night_for(loc, night, tz)
+
+    start_utc, end_utc = night_window(loc.longitude, events.date, tz or loc.timezone)
+    dusk = events.astronomical_dusk
+    dawn = events.astronomical_dawn
+    ref = (dusk or start_utc) + ((dawn or end_utc) - (dusk or start_utc)) / 2
+    if dusk is not None and dawn is not None:
+        dark_start = (dusk - ref).total_seconds() / 3600
+        dark_end = (dawn - ref).total_seconds() / 3600
+    else:
+        dark_start = dark_end = 0.0
+
+    idx = filter_mag(CATALOG.ever_above(loc.latitude, min_alt), max_mag)
+    if not len(idx):
+        return []
+
+    t_ref = get_timescale().from_datetime(ref)
+    ra, dec = radec_of_date(CATALOG.ra_hours[idx], CATALOG.dec_deg[idx], t_ref)
+    lst = local_sidereal_hours(loc.latitude, loc.longitude, t_ref)
+    table = transit_table(ra, dec, loc.latitude, lst, dark_start, dark_end, min_alt)
+
+    score = np.where(
+        np.isnan(table.best),
+        -np.inf,
+        visibility_score(np.nan_to_num(table.best_alt_deg), -18.0, None, "dso"),
+    )
+    top = np.argsort(-score, kind="stable")[:limit]
+
+    out: List[TargetWindow] = []
+    for i in top:
+        has_window = not np.isnan(table.best[i])
+        mag = float(CATALOG.mag[idx[i]])
+        out.append(
+            TargetWindow(
+                name=str(CATALOG.names[idx[i]]),
+                kind="dso",
+                magnitude=None if np.isnan(mag) else mag,
+                rise=_hours_after(ref, table.rise[i]),
+                transit=_hours_after(ref, table.transit[i]),
+                set=_hours_after(ref, table.set[i]),
+                transit_altitude_deg=float(table.transit_alt_deg[i]),
+                window_start=_hours_after(ref, table.window_start[i]),
+                window_end=_hours_after(ref, table.window_end[i]),
+                best_time=_hours_after(ref, table.best[i]),
+                best_altitude_deg=float(table.best_alt_deg[i]) if has_window else None,
+                score=float(score[i]) if has_window else 0.0,
+            )
+        )
+    return out
@@ -1,24 +1,111 @@
 # app/routers/weather.py
+from datetime import datetime, timezone
+from typing import List
+
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
-from app.core.deps import get_current_user
-from app.core.weather_client import get_weather_for_time, WeatherError
-from app.db.database import get_db
+from app.core.deps import Principal, get_current_user
+from app.core.weather_client import (
+    WeatherError,
+    forecast_key,
+    get_hourly_forecasts,
+    get_weather_for_time,
+    pick_hour,
+)
+from app.db.database import get_async_read_db
 from app.models.observation_session import ObservationSession  # <-- fix path
-from app.models.user import User
-from app.schemas.weather import WeatherInfo
+from app.schemas.weather import BatchWeatherRequest, SessionWeather, WeatherInfo
 
 router = APIRouter(prefix="/sessions", tags=["weather"])
 
+MAX_BATCH_SESSIONS = 200
+
+
+@router.post("/weather/batch", response_model=List[SessionWeather])
+async def get_sessions_weather(
+    body: BatchWeatherRequest,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Weather for many sessions in one call: explicit session_ids, or every
+    upcoming planned session. Sessions sharing a forecast cell and day share
+    one forecast, and each day's uncached cells go upstream as a single
+    multi-coordinate request.
+    """
+    q = (
+        select(ObservationSession)
+        .options(joinedload(ObservationSession.location))
+        .where(ObservationSession.owner_id == current_user.id)
+    )
+    if body.session_ids:
+        if len(body.session_ids) > MAX_BATCH_SESSIONS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {MAX_BATCH_SESSIONS} sessions per request",
+            )
+        q = q.where(ObservationSession.id.in_(body.session_ids))
+    elif body.upcoming:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)  # DB stores naive UTC
+        q = q.where(
+            ObservationSession.status == "planned",
+            ObservationSession.scheduled_start >= now,
+        )
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide session_ids or upcoming=true",
+        )
+
+    sessions = (
+        await db.scalars(q.order_by(ObservationSession.scheduled_start.asc()).limit(MAX_BATCH_SESSIONS))
+    ).all()
+
+    points = []
+    for s in sessions:
+        loc = s.location
+        if loc and loc.latitude is not None and loc.longitude is not None:
+            when = s.scheduled_start
+            if when.tzinfo is None:  # DB stores naive UTC
+                when = when.replace(tzinfo=timezone.utc)
+            points.append((s, loc.latitude, loc.longitude, when))
+
+    forecasts = await get_hourly_forecasts((lat, lon, when.date()) for _, lat, lon, when in points)
+
+    out: List[SessionWeather] = []
+    located = {s.id for s, _, _, _ in points}
+    for s, lat, lon, when in points:
+        hourly = forecasts[forecast_key(lat, lon, when.date())]
+        if isinstance(hourly, WeatherError):
+            out.append(SessionWeather(session_id=s.id, error=str(hourly)))
+            continue
+        try:
+            out.append(SessionWeather(session_id=s.id, weather=WeatherInfo(**pick_hour(hourly, when))))
+        except WeatherError as exc:
+            out.append(SessionWeather(session_id=s.id, error=str(exc)))
+
+    for s in sessions:
+        if s.id not in located:
+            out.append(SessionWeather(session_id=s.id, error="Session has no location"))
+
+    return out
+
 
 @router.get("/{session_id}/weather/", response_model=WeatherInfo)
 async def get_session_weather(
     session_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    session = db.query(ObservationSession).get(session_id)
+    # load the location up front: lazy loads don't work on an AsyncSession
+    session = await db.get(
+        ObservationSession,
+        session_id,
+        options=[joinedload(ObservationSession.location)],
+    )
     if not session or session.owner_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -8,4 +8,5 @@ class GeocodeResult(BaseModel):
     latitude: float
     longitude: float
     country: Optional[str] = None
+    admin1: Optional[str] = None  # state / province
     timezone: Optional[str] = None
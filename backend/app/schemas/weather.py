@@ -1,5 +1,5 @@
 # app/schemas/weather.py
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -13,3 +13,14 @@ class WeatherInfo(BaseModel):
     cloud_cover: Optional[float] = None
     weather_code: Optional[int] = None  # 
 
+
+
+class BatchWeatherRequest(BaseModel):
+    session_ids: Optional[List[int]] = None
+    upcoming: bool = False  # all planned sessions from now on
+
+
+class SessionWeather(BaseModel):
+    session_id: int
+    weather: Optional[WeatherInfo] = None
+    error: Optional[str] = None
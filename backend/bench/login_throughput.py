@@ -0,0 +1,88 @@
+"""
+Login throughput benchmark.
+
+Fires concurrent logins at the app in-process while probing /health, to show
+both how many logins/s the hashing pool sustains and that other requests stay
+responsive meanwhile. Uses a throwaway SQLite database.
+
+    cd backend
+    python -m bench.login_throughput --requests 200 --concurrency 32
+    PASSWORD_HASH_ROUNDS=100000 PASSWORD_HASH_WORKERS=8 python -m bench.login_throughput
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="astroplanner-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.db')}"
+os.environ.setdefault("EPHEMERIS_WARMUP", "0")
+
+import httpx  # noqa: E402
+
+from app.core.config import PASSWORD_HASH_ROUNDS, PASSWORD_HASH_WORKERS  # noqa: E402
+from app.db.migrations import run_migrations  # noqa: E402
+from app.main import app  # noqa: E402
+
+EMAIL = "bench@example.com"
+PASSWORD = "correct horse battery staple"
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+async def main(requests: int, concurrency: int) -> None:
+    run_migrations()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        r = await client.post("/auth/register", json={"email": EMAIL, "password": PASSWORD})
+        r.raise_for_status()
+
+        slots = asyncio.Semaphore(concurrency)
+        login_times = []
+        done = asyncio.Event()
+
+        async def login():
+            async with slots:
+                t = time.perf_counter()
+                r = await client.post("/auth/login", data={"username": EMAIL, "password": PASSWORD})
+                r.raise_for_status()
+                login_times.append(time.perf_counter() - t)
+
+        probe_times = []
+
+        async def probe():
+            while not done.is_set():
+                t = time.perf_counter()
+                (await client.get("/health")).raise_for_status()
+                probe_times.append(time.perf_counter() - t)
+                await asyncio.sleep(0.01)
+
+        prober = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await prober
+
+    print(f"rounds={PASSWORD_HASH_ROUNDS} workers={PASSWORD_HASH_WORKERS} "
+          f"requests={requests} concurrency={concurrency}")
+    print(f"logins/s:       {requests / elapsed:8.1f}")
+    print(f"login latency:  p50 {_pct(login_times, 0.5):7.1f} ms   p99 {_pct(login_times, 0.99):7.1f} ms")
+    print(f"/health during: p50 {_pct(probe_times, 0.5):7.1f} ms   p99 {_pct(probe_times, 0.99):7.1f} ms"
+          f"   (n={len(probe_times)}, mean {statistics.fmean(probe_times) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    if args.requests < 1 or args.concurrency < 1:
+        sys.exit("--requests and --concurrency must be positive")
+    asyncio.run(main(args.requests, args.concurrency))
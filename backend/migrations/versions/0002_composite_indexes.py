@@ -0,0 +1,36 @@
+"""composite indexes for the hot query patterns
+
+- sessions by owner, newest/oldest first (lists, batch weather)
+- sessions by location + status + start (ICS export)
+- logs by session, by created_at
+- locations by owner
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_sessions_owner_start", "sessions", ["owner_id", "scheduled_start"])
+    op.create_index(
+        "ix_sessions_location_status_start",
+        "sessions",
+        ["location_id", "status", "scheduled_start"],
+    )
+    op.create_index("ix_observation_logs_session_created", "observation_logs", ["session_id", "created_at"])
+    op.create_index("ix_locations_owner_id", "locations", ["owner_id", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_locations_owner_id", table_name="locations")
+    op.drop_index("ix_observation_logs_session_created", table_name="observation_logs")
+    op.drop_index("ix_sessions_location_status_start", table_name="sessions")
+    op.drop_index("ix_sessions_owner_start", table_name="sessions")
@@ -0,0 +1,29 @@
+"""updated_at on sessions and locations (calendar ETag / Last-Modified)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("sessions", sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("locations", sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True))
+    # best guess for existing rows
+    op.execute("UPDATE sessions SET updated_at = created_at")
+    op.execute("UPDATE locations SET updated_at = CURRENT_TIMESTAMP")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("locations") as batch:
+        batch.drop_column("updated_at")
+    with op.batch_alter_table("sessions") as batch:
+        batch.drop_column("updated_at")